@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Benchmark the block-scanning object splitter against the old per-character loop.
+
+Generates a synthetic PRIDE-like dump (concatenated project objects with long
+descriptions, escapes and nested structures), splits it with both
+implementations and the memory-mapped byte scanner, checks that they produce
+identical objects and reports the throughput of each. Finishes with
+correctness checks at tiny block/chunk sizes for the chunked scanners and the
+byte offsets of iter_decoded_objects.
+
+Usage: python benchmark_splitter.py [num_objects] [dump_file]
+"""
+
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from json_stream import iter_decoded_objects, iter_object_spans, iter_object_strings, iter_raw_objects, map_file
+
+
+def legacy_split(f):
+    """The original StreamingJSONParser.find_json_objects_streaming loop, for reference."""
+    buffer = ""
+    brace_count = 0
+    in_string = False
+    escape_next = False
+
+    for line in f:
+        for char in line:
+            if escape_next:
+                escape_next = False
+                buffer += char
+                continue
+
+            if char == '\\':
+                escape_next = True
+                buffer += char
+                continue
+
+            if char == '"' and not escape_next:
+                in_string = not in_string
+                buffer += char
+                continue
+
+            if not in_string:
+                if char == '{':
+                    if brace_count == 0:
+                        buffer = char
+                    else:
+                        buffer += char
+                    brace_count += 1
+                elif char == '}':
+                    buffer += char
+                    brace_count -= 1
+                    if brace_count == 0:
+                        yield buffer.strip()
+                        buffer = ""
+                else:
+                    if brace_count > 0:
+                        buffer += char
+            else:
+                buffer += char
+
+    if buffer.strip():
+        yield buffer.strip()
+
+
+WORDS = ["immunopeptidomics", "HLA", "class", "I", "peptides", "were", "eluted", "from", "tumour",
+         "tissue", "and", "analysed", "on", "a", "timsTOF", "Pro", "mass", "spectrometer", "using",
+         "DDA-PASEF", "naïve", "T", "cells", "(n=12)", "were", "isolated;", "samples", "100%"]
+# Occasional characters the splitter has to treat specially
+SPECIAL_WORDS = ["{braces}", "\"quoted\"", "back\\slash", "}", "{"]
+
+
+def make_project(i: int) -> dict:
+    words = [random.choice(SPECIAL_WORDS) if random.random() < 0.01 else random.choice(WORDS)
+             for _ in range(random.randint(50, 400))]
+    description = " ".join(words)
+    return {
+        "accession": f"PXD{i:06d}",
+        "title": f"Project {i} {random.choice(words)}",
+        "projectDescription": description,
+        "keywords": random.sample(WORDS, 3),
+        "instruments": [{"accession": "MS:1003005", "name": "timsTOF Pro"}],
+        "submitters": [{"firstName": "A", "lastName": "B", "affiliation": {"name": "Lab {x}"}}],
+        "submissionDate": "2021-01-01",
+    }
+
+
+def write_dump(path: str, count: int) -> None:
+    random.seed(0)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("[\n")
+        for i in range(count):
+            f.write(json.dumps(make_project(i), indent=2, ensure_ascii=False))
+            f.write(",\n" if i < count - 1 else "\n")
+        f.write("]\n")
+
+
+def mapped_split(path):
+    with map_file(path) as buf:
+        return [buf[start:end].decode('utf-8') for start, end in iter_object_spans(buf)]
+
+
+def check_decoded_offsets() -> bool:
+    """Byte ranges from iter_decoded_objects must cover the objects exactly, even after invalid UTF-8."""
+    data = (b'{"accession": "PXD000001", "title": "bad \xff\xfe bytes, caf\xc3\xa9"}\n'
+            b'{"accession": "PXD000002", "title": "trailing comma",}\n'
+            b'{"accession": "PXD000003", "title": "\xe2\x82"}\n'
+            b'{"accession": "PXD000004"}\n')
+    for chunk_size in (1, 2, 3, 7, len(data)):
+        chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+        found = [(data[offset:offset + length], obj is None)
+                 for offset, length, obj, _raw in iter_decoded_objects(chunks)]
+        expected = [(line, b',}' in line) for line in data.splitlines()]
+        if found != expected:
+            print(f"MISMATCH in decoded byte offsets at chunk size {chunk_size}")
+            return False
+    return True
+
+
+def time_splitter(name, split, path, size_mb):
+    start = time.perf_counter()
+    if split is mapped_split:
+        objects = split(path)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            objects = list(split(f))
+    elapsed = time.perf_counter() - start
+    print(f"{name:>16}: {len(objects)} objects in {elapsed:.2f}s ({size_mb / elapsed:.1f} MB/s)")
+    return objects, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.gettempdir(), "pride_splitter_benchmark.json")
+
+    if not os.path.exists(path):
+        print(f"Writing synthetic dump with {count} objects to {path}")
+        write_dump(path, count)
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"Input: {path} ({size_mb:.1f} MB)")
+
+    legacy, legacy_time = time_splitter("per-character", legacy_split, path, size_mb)
+    blocks, block_time = time_splitter("block scanner", iter_object_strings, path, size_mb)
+    mapped, mapped_time = time_splitter("memory-mapped", mapped_split, path, size_mb)
+
+    if not legacy == blocks == mapped:
+        print("MISMATCH: the splitters produced different objects")
+        sys.exit(1)
+    print(f"Identical output; speed-up {legacy_time / block_time:.1f}x (block), "
+          f"{legacy_time / mapped_time:.1f}x (memory-mapped)")
+
+    # Small block sizes exercise every state carried across block boundaries
+    sample = open(path, 'r', encoding='utf-8').read(200000)
+    for block_size in (1, 2, 3, 7, 64):
+        if list(iter_object_strings(io.StringIO(sample), block_size)) != list(legacy_split(io.StringIO(sample))):
+            print(f"MISMATCH at block size {block_size}")
+            sys.exit(1)
+    print("Block-boundary check passed")
+
+    # The pipeline's chunked byte scanner must carry its state like the one-shot scan,
+    # including on quote-imbalanced input
+    raw_sample = sample.encode('utf-8')
+    raw_sample = raw_sample[:1000] + b'"' + raw_sample[1000:]
+    expected = [(start, raw_sample[start:end]) for start, end in iter_object_spans(raw_sample)]
+    for chunk_size in (1, 2, 3, 7, 4096):
+        chunks = (raw_sample[i:i + chunk_size] for i in range(0, len(raw_sample), chunk_size))
+        if list(iter_raw_objects(chunks)) != expected:
+            print(f"MISMATCH in chunked byte scan at chunk size {chunk_size}")
+            sys.exit(1)
+    print("Chunked byte-scan check passed")
+
+    if not check_decoded_offsets():
+        sys.exit(1)
+    print("Byte-offset check passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Open PRIDE dumps whether or not they are compressed.
+
+The file type is sniffed from its magic bytes rather than its extension, so
+snapshots written by pride_snapshot.py (gzip, one project per line) and
+dumps kept as .bz2 / .xz / .zst can be fed to the converters and filters
+as-is without decompressing them to disk first.
+
+For sequential reads the decompression can run in a background thread
+(zlib, bz2, lzma and zstandard all release the GIL while they work), so it
+overlaps with parsing instead of adding to it.
+
+zstd support needs the optional `zstandard` package.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import queue
+import threading
+from typing import IO
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP_MAGIC = b'\x1f\x8b'
+# Magic bytes -> compression name, checked in order
+COMPRESSION_MAGIC = [
+    (GZIP_MAGIC, 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+]
+COMPRESSION_SUFFIXES = ('.gz', '.bz2', '.xz', '.zst')
+
+# Decompressed bytes per chunk handed over by the background thread, and
+# how many chunks may be waiting
+BACKGROUND_CHUNK_SIZE = 1 << 20
+BACKGROUND_QUEUE_DEPTH = 8
+
+
+def detect_compression(filename: str) -> str:
+    """
+    Identify the compression of a file from its first bytes.
+
+    Args:
+        filename: Path to the input file
+
+    Returns:
+        'gzip', 'bz2', 'xz', 'zstd' or '' for uncompressed input
+    """
+    with open(filename, 'rb') as f:
+        magic = f.read(6)
+    for prefix, compression in COMPRESSION_MAGIC:
+        if magic.startswith(prefix):
+            return compression
+    return ''
+
+
+def _open_decompressed(filename: str, compression: str) -> IO[bytes]:
+    """Binary file object over the decompressed content."""
+    if compression == 'gzip':
+        return gzip.open(filename, 'rb')
+    if compression == 'bz2':
+        return bz2.open(filename, 'rb')
+    if compression == 'xz':
+        return lzma.open(filename, 'rb')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError(f"{filename} is zstd-compressed; install the 'zstandard' package to read it")
+        return io.BufferedReader(ZstdReader(filename))
+    return open(filename, 'rb')
+
+
+class ZstdReader(io.RawIOBase):
+    """
+    Seekable view of the decompressed content of a zstd file.
+
+    Like gzip.open(), a forward seek decompresses and skips the bytes in
+    between, and a backward seek starts over from the beginning, so random
+    access (object_index.py, --reprocess) works but is cheapest in order.
+    """
+
+    def __init__(self, filename: str):
+        super().__init__()
+        self.filename = filename
+        self.position = 0
+        self.reader = self._open()
+
+    def _open(self):
+        # pzstd and concatenated .zst files hold several frames
+        return zstandard.ZstdDecompressor().stream_reader(open(self.filename, 'rb'), closefd=True,
+                                                          read_across_frames=True)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        count = self.reader.readinto(b)
+        self.position += count
+        return count
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("zstd input can only seek from the start or the current position")
+        if offset < self.position:
+            self.reader.close()
+            self.reader = self._open()
+            self.position = 0
+        while self.position < offset:
+            skipped = len(self.reader.read(min(offset - self.position, BACKGROUND_CHUNK_SIZE)))
+            if not skipped:
+                break
+            self.position += skipped
+        return self.position
+
+    def close(self) -> None:
+        if not self.closed:
+            self.reader.close()
+        super().close()
+
+
+class BackgroundReader(io.RawIOBase):
+    """
+    Read-ahead wrapper that pulls chunks from a file object in a thread.
+
+    Chunks travel over a bounded queue, so at most BACKGROUND_QUEUE_DEPTH
+    chunks are buffered ahead of the consumer. Errors raised while reading
+    are re-raised in the consuming thread.
+    """
+
+    def __init__(self, source: IO[bytes], chunk_size: int = BACKGROUND_CHUNK_SIZE,
+                 depth: int = BACKGROUND_QUEUE_DEPTH):
+        super().__init__()
+        self.source = source
+        self.chunk_size = chunk_size
+        self.chunks: queue.Queue = queue.Queue(depth)
+        self.pending = memoryview(b'')
+        self.finished = False
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._pump, name="decompress", daemon=True)
+        self.thread.start()
+
+    def _pump(self) -> None:
+        try:
+            while not self.stopping.is_set():
+                chunk = self.source.read(self.chunk_size)
+                self.chunks.put(chunk)
+                if not chunk:
+                    return
+        except BaseException as e:
+            self.chunks.put(e)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self.pending and not self.finished:
+            item = self.chunks.get()
+            if isinstance(item, BaseException):
+                self.finished = True
+                raise item
+            if not item:
+                self.finished = True
+            self.pending = memoryview(item)
+        count = min(len(b), len(self.pending))
+        b[:count] = self.pending[:count]
+        self.pending = self.pending[count:]
+        return count
+
+    def close(self) -> None:
+        if not self.closed:
+            # Unblock the thread if it is waiting for room in the queue
+            self.stopping.set()
+            while self.thread.is_alive():
+                try:
+                    self.chunks.get_nowait()
+                except queue.Empty:
+                    pass
+                self.thread.join(0.01)
+            self.source.close()
+        super().close()
+
+
+def open_binary_input(filename: str, background: bool = False) -> IO[bytes]:
+    """
+    Open an input file for reading bytes, decompressing on the fly if needed.
+
+    Args:
+        filename: Path to a plain or gzip/bz2/xz/zstd-compressed file
+        background: Decompress in a background thread; the result is then
+            sequential only (no seek), so leave this off for random access.
+            Ignored on a single CPU, where the thread cannot overlap anything
+
+    Returns:
+        Binary file object over the (decompressed) content; seekable unless
+        background is set (compressed input seeks by decompressing, so
+        backward seeks cost a re-read from the start)
+    """
+    compression = detect_compression(filename)
+    f = _open_decompressed(filename, compression)
+    if background and compression and (os.cpu_count() or 1) > 1:
+        return io.BufferedReader(BackgroundReader(f), BACKGROUND_CHUNK_SIZE)
+    return f
+
+
+def open_text_input(filename: str, background: bool = False) -> IO[str]:
+    """
+    Open an input file for reading text, decompressing on the fly if needed.
+
+    Args:
+        filename: Path to a plain or gzip/bz2/xz/zstd-compressed file
+        background: Decompress in a background thread (sequential reads only)
+
+    Returns:
+        Text file object (UTF-8)
+    """
+    return io.TextIOWrapper(open_binary_input(filename, background), encoding='utf-8')
+
+
+def strip_compression_suffix(filename: str) -> str:
+    """Drop a trailing compression suffix so derived output names are not mistaken for compressed files."""
+    for suffix in COMPRESSION_SUFFIXES:
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
@@ -0,0 +1,569 @@
+"""
+Declarative dataset filters shared by the PRIDE scripts.
+
+A filter spec is plain data (a dict, or a JSON file passed with
+--filter-spec), so the same criteria can be run on a JSON dump
+(pride_new_parser.py), a converted TSV (filter_tsv.py) or live API results
+(../test_query.py):
+
+    {
+        "name": "my-filter",
+        "criteria": {
+            "timsTOF": {"fields": ["instruments"], "mode": "family", "terms": ["timsTOF"]},
+            "immunopeptidomics": {"fields": ["keywords", "title"], "terms": ["hla", "mhc"]},
+            "phospho": {"fields": ["keywords"], "terms": ["phospho"]}
+        },
+        "require": {"all": ["timsTOF", "immunopeptidomics", {"not": "phospho"}]}
+    }
+
+Each criterion searches the named fields, lowercased and joined with spaces,
+for its terms (substring match):
+
+- mode "any" (default): at least one term occurs;
+- mode "all": every term occurs;
+- mode "family": the field holds an instrument of one of the listed families
+  (see instrument_normalizer.py).
+
+With "per_field": true the fields are searched one by one instead, so a
+multi-word term only matches within a single field (in mode "all" each term
+must occur within some field).
+
+"require" combines criterion names with "all", "any" and "not"; criteria it
+does not mention are only evaluated for reporting. An optional "label"
+names a criterion in reports, and "pushdown": "keyword" lets test_query.py
+send the terms to PRIDE's full-text search as well (which requires every
+word, so it only applies to single-term or mode "all" criteria).
+
+Field values are rendered the way updated_json_parser.py writes them to TSV
+(lists joined with '; ', instrument objects by name), so a JSON dataset and
+its converted TSV row match the same criteria. Each field is rendered once
+per record, however many criteria use it.
+
+"all"/"any" stop at the first operand that decides them. A filter evaluates
+the operands in spec order unless it is given CriterionStats (measured cost
+and pass rate of each criterion, see DatasetFilter.order_by), in which case
+the operands are reordered so that cheap, decisive criteria run first.
+"""
+
+import json
+import math
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from instrument_normalizer import InstrumentNormalizer
+from keyword_matcher import KeywordMatcher
+
+MATCH_MODES = ('any', 'all', 'family')
+
+# Spec field name -> record keys holding it, in order of preference: PRIDE
+# JSON, converted TSV columns and test_query.py project records differ
+FIELD_ALIASES = {
+    'projectDescription': ('projectDescription', 'description'),
+    'instruments': ('instruments', 'instrument'),
+    'sample': ('sample', 'sampleProcessing', 'sampleProcessingProtocol'),
+}
+
+# Filters of filter_tsv.py, pride_new_parser.py and test_query.py
+BUILTIN_SPECS: Dict[str, Dict[str, Any]] = {
+    'ultra-strict': {
+        'name': 'ultra-strict',
+        'description': "timsTOF instruments, immunopeptidomics terms in keywords/title/description, "
+                       "cancer terms in the keywords field only",
+        'criteria': {
+            'timsTOF': {
+                'label': "Datasets with timsTOF",
+                'fields': ['instruments'],
+                'mode': 'family',
+                'terms': ['timsTOF'],
+            },
+            'immunopeptidomics': {
+                'label': "Datasets with immunopeptidomics (strict)",
+                'fields': ['keywords', 'title', 'projectDescription'],
+                'terms': [
+                    'immunopeptidomics', 'immunopeptidomic', 'immunopeptidome', 'immunopeptide',
+                    'hla peptidome', 'mhc peptidome', 'antigen presentation', 'peptide presentation',
+                    't cell epitope', 'cd8 epitope', 'cd4 epitope', 'hla class i', 'hla class ii',
+                    'mhc class i', 'mhc class ii', 'hla-i', 'hla-ii', 'mhc-i', 'mhc-ii',
+                    'human leukocyte antigen peptidome', 'major histocompatibility complex peptidome',
+                ],
+            },
+            'cancer': {
+                'label': "Datasets with cancer keywords (keywords field only)",
+                'fields': ['keywords'],
+                'terms': [
+                    'cancer', 'tumour', 'tumor', 'malignant', 'benign', 'oncology', 'neoplasm',
+                    'carcinoma', 'sarcoma', 'leukemia', 'lymphoma', 'melanoma', 'glioblastoma',
+                    'adenocarcinoma', 'metastasis', 'metastatic', 'cancerous', 'tumorous',
+                    'neuroblastoma', 'oral cancer', 'breast cancer', 'lung cancer', 'prostate cancer',
+                    'colorectal cancer', 'pancreatic cancer', 'ovarian cancer', 'cervical cancer',
+                    'endometrial cancer', 'thyroid cancer', 'brain cancer', 'bone cancer', 'skin cancer',
+                    'stomach cancer', 'esophageal cancer', 'head and neck cancer', 'testicular cancer',
+                    'adrenal cancer',
+                ],
+            },
+            # Reported only: other omics terms are allowed alongside immunopeptidomics
+            'other omics': {
+                'label': "Datasets excluded (general proteomics)",
+                'fields': ['keywords', 'title', 'projectDescription'],
+                'terms': [
+                    'proteomics', 'proteomic', 'phosphoproteomics', 'phosphoproteomic',
+                    'glycoproteomics', 'glycoproteomic', 'acetylproteomics', 'acetylproteomic',
+                    'ubiquitinomics', 'ubiquitinomic', 'metabolomics', 'metabolomic', 'lipidomics',
+                    'lipidomic', 'transcriptomics', 'transcriptomic', 'genomics', 'genomic',
+                    'epigenomics', 'epigenomic', 'phosphorylation', 'glycosylation', 'acetylation',
+                    'ubiquitination', 'methylation', 'sumoylation', 'palmitoylation', 'myristoylation',
+                    'farnesylation', 'geranylation',
+                ],
+            },
+        },
+        'require': {'all': ['timsTOF', 'immunopeptidomics', 'cancer']},
+    },
+    'immunopeptidomics-cancer-timstof': {
+        'name': 'immunopeptidomics-cancer-timstof',
+        'description': "Immunopeptidomics and cancer terms in title/description/keywords/tags, "
+                       "timsTOF in instruments, title or description",
+        # Like the checks this spec replaced, each field is searched on its own
+        'criteria': {
+            'immunopeptidomics': {
+                'fields': ['title', 'projectDescription', 'keywords', 'projectTags'],
+                'per_field': True,
+                'terms': [
+                    'immunopeptidomics', 'immunopeptidome', 'immunopeptides', 'mhc', 'hla',
+                    'antigen presentation', 'peptide presentation', 'major histocompatibility',
+                    'immunopeptide',
+                ],
+            },
+            'cancer': {
+                'fields': ['title', 'projectDescription', 'keywords', 'projectTags'],
+                'per_field': True,
+                'terms': [
+                    'cancer', 'tumor', 'tumour', 'carcinoma', 'melanoma', 'leukemia', 'lymphoma',
+                    'oncology', 'neoplasm', 'malignant', 'metastasis', 'adenocarcinoma', 'sarcoma',
+                    'glioma',
+                ],
+            },
+            'timsTOF': {
+                'fields': ['instruments', 'title', 'projectDescription'],
+                'per_field': True,
+                'terms': ['timstof', 'tims-tof'],
+            },
+        },
+        'require': {'all': ['immunopeptidomics', 'cancer', 'timsTOF']},
+    },
+    'strict-api': {
+        'name': 'strict-api',
+        'description': "Immunopeptidomics and cancer in title/sample/diseases, timsTOF instruments, "
+                       "cell line/tissue/xenograft samples",
+        'criteria': {
+            'required terms': {
+                'fields': ['title', 'sample', 'diseases'],
+                'mode': 'all',
+                'terms': ['immunopeptidomics', 'cancer'],
+                'pushdown': 'keyword',
+            },
+            'instrument': {
+                'fields': ['instruments'],
+                'mode': 'family',
+                'terms': ['timsTOF'],
+                'pushdown': 'keyword',
+            },
+            'sample terms': {
+                'fields': ['sample'],
+                'terms': ['cell line', 'tissue', 'xenograft'],
+            },
+        },
+        'require': {'all': ['required terms', 'instrument', 'sample terms']},
+    },
+}
+
+
+def render_value(value: Any) -> str:
+    """Text of a field value as updated_json_parser.py writes it to TSV."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value.replace('\t', ' ').replace('\n', ' ').replace('\r', ' ').strip()
+    if isinstance(value, list):
+        return "; ".join(part for part in (render_value(item) for item in value) if part)
+    if isinstance(value, dict):
+        for key in ('name', 'title', 'accession'):
+            if value.get(key):
+                return str(value[key])
+    return str(value)
+
+
+class Criterion:
+    """One named test of a filter spec: terms searched for in some fields."""
+
+    def __init__(self, name: str, spec: Dict[str, Any], normalizer: InstrumentNormalizer):
+        self.name = name
+        self.label = spec.get('label', name)
+        self.fields = tuple(spec.get('fields') or ())
+        self.terms = list(spec.get('terms') or ())
+        self.mode = spec.get('mode', 'any')
+        self.pushdown = spec.get('pushdown')
+        # Newlines never occur in rendered field text (see render_value), so
+        # joining the fields with one keeps every term match inside a field
+        self.separator = '\n' if spec.get('per_field') else ' '
+        if not self.fields or not self.terms:
+            raise ValueError(f"Criterion '{name}' needs 'fields' and 'terms'")
+        if self.mode not in MATCH_MODES:
+            raise ValueError(f"Criterion '{name}' has unknown mode '{self.mode}' (expected one of {MATCH_MODES})")
+
+        if self.mode == 'family':
+            self.families = frozenset(self.terms)
+            self.normalizer = normalizer
+            self.key = (self.fields, self.separator, self.mode, self.families)
+        else:
+            self.matcher = KeywordMatcher(self.terms)
+            self.term_set = frozenset(self.matcher.terms)
+            # Criteria with the same key give the same result on any record
+            self.key = (self.fields, self.separator, self.mode, self.term_set)
+
+    def test(self, text: str) -> bool:
+        """Apply the criterion to the lowercased text of its fields."""
+        if self.mode == 'any':
+            return self.matcher.matches(text)
+        if self.mode == 'all':
+            return len(self.matcher.find_all(text)) == len(self.matcher)
+        return not self.families.isdisjoint(self.normalizer.lookup(text)[1])
+
+    def test_hits(self, hits: Set[str]) -> bool:
+        """Apply a term criterion given every term found in its fields' text (a superset of its own)."""
+        if self.mode == 'any':
+            return not self.term_set.isdisjoint(hits)
+        return self.term_set <= hits
+
+    def matched_terms(self, text: str) -> Set[str]:
+        """Terms (or instrument models) of the criterion found in the text."""
+        if self.mode == 'family':
+            models, families = self.normalizer.lookup(text)
+            return set(models) if not self.families.isdisjoint(families) else set()
+        return self.matcher.find_all(text)
+
+
+class RecordCheck:
+    """
+    Criterion results for one record; each field is rendered and each criterion run at most once.
+
+    With `matchers` ((fields, separator) -> matcher for the terms of every
+    criterion on that text, see FilterSet), each text is scanned once and
+    the term criteria on it are answered from the hits.
+    """
+
+    def __init__(self, record: Dict[str, Any], matchers: Optional[Dict[tuple, KeywordMatcher]] = None):
+        self.record = record
+        self.matchers = matchers or {}
+        self.field_texts: Dict[str, str] = {}
+        self.texts: Dict[tuple, str] = {}
+        self.hits: Dict[tuple, Set[str]] = {}
+        self.results: Dict[tuple, bool] = {}
+
+    def field_text(self, field: str) -> str:
+        text = self.field_texts.get(field)
+        if text is None:
+            value = None
+            for key in FIELD_ALIASES.get(field, (field,)):
+                value = self.record.get(key)
+                if value:
+                    break
+            text = self.field_texts[field] = render_value(value).lower()
+        return text
+
+    def text(self, fields: tuple, separator: str = ' ') -> str:
+        """Lowercased text of some fields, joined with spaces (or a criterion's separator)."""
+        text = self.texts.get((fields, separator))
+        if text is None:
+            text = self.texts[fields, separator] = separator.join(self.field_text(field) for field in fields)
+        return text
+
+    def __call__(self, criterion: Criterion) -> bool:
+        result = self.results.get(criterion.key)
+        if result is None:
+            source = (criterion.fields, criterion.separator)
+            matcher = self.matchers.get(source) if criterion.mode != 'family' else None
+            if matcher is None:
+                result = criterion.test(self.text(*source))
+            else:
+                hits = self.hits.get(source)
+                if hits is None:
+                    hits = self.hits[source] = matcher.find_all(self.text(*source))
+                result = criterion.test_hits(hits)
+            self.results[criterion.key] = result
+        return result
+
+
+class DatasetFilter:
+    """A compiled filter spec."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self.name = spec.get('name', 'filter')
+        self.description = spec.get('description', '')
+        self.normalizer = InstrumentNormalizer()
+        self.criteria: Dict[str, Criterion] = {
+            name: Criterion(name, criterion, self.normalizer)
+            for name, criterion in (spec.get('criteria') or {}).items()
+        }
+        if not self.criteria:
+            raise ValueError(f"Filter '{self.name}' has no criteria")
+        # Without "require" every criterion must match
+        self.require_spec = spec.get('require', {'all': list(self.criteria)})
+        # Expression actually evaluated; reordered by order_by
+        self.plan = self.require_spec
+        self.require = self._compile(self.require_spec)
+
+    def _compile(self, expression: Any) -> Callable[[RecordCheck], bool]:
+        """Turn a require expression into a function of the per-record criterion check."""
+        if isinstance(expression, str):
+            criterion = self.criteria.get(expression)
+            if criterion is None:
+                raise ValueError(f"Filter '{self.name}' requires unknown criterion '{expression}'")
+            return lambda check: check(criterion)
+        if isinstance(expression, dict) and len(expression) == 1:
+            operator, operand = next(iter(expression.items()))
+            if operator == 'not':
+                inner = self._compile(operand)
+                return lambda check: not inner(check)
+            if operator in ('all', 'any') and isinstance(operand, list):
+                parts = [self._compile(part) for part in operand]
+                if operator == 'all':
+                    return lambda check: all(part(check) for part in parts)
+                return lambda check: any(part(check) for part in parts)
+        raise ValueError(f"Filter '{self.name}' has an invalid require expression: {expression!r}")
+
+    def _estimate(self, expression: Any, stats: 'CriterionStats') -> tuple:
+        """
+        Reorder a (valid) require expression for stats.
+
+        Returns:
+            (reordered expression, expected cost per record, pass probability),
+            treating the criteria as independent
+        """
+        if isinstance(expression, str):
+            return expression, stats.cost(expression), stats.pass_rate(expression)
+        operator, operand = next(iter(expression.items()))
+        if operator == 'not':
+            inner, cost, probability = self._estimate(operand, stats)
+            return {'not': inner}, cost, 1.0 - probability
+        parts = [self._estimate(part, stats) for part in operand]
+        # "all" stops at the first failure and "any" at the first success:
+        # run first what is cheap relative to how likely it is to decide
+        if operator == 'all':
+            parts.sort(key=lambda part: part[1] / (1.0 - part[2]) if part[2] < 1.0 else math.inf)
+        else:
+            parts.sort(key=lambda part: part[1] / part[2] if part[2] > 0.0 else math.inf)
+        cost = 0.0
+        reached = 1.0
+        for _, part_cost, probability in parts:
+            cost += reached * part_cost
+            reached *= probability if operator == 'all' else 1.0 - probability
+        probability = reached if operator == 'all' else 1.0 - reached
+        return {operator: [part[0] for part in parts]}, cost, probability
+
+    def order_by(self, stats: 'CriterionStats') -> Any:
+        """
+        Evaluate the require expression in the order stats suggest from now on.
+
+        Only the order of "all"/"any" operands changes, so matches() gives
+        the same results, just with fewer criteria evaluated per record.
+
+        Returns:
+            The reordered expression
+        """
+        self.plan = self._estimate(self.require_spec, stats)[0]
+        self.require = self._compile(self.plan)
+        return self.plan
+
+    def conjuncts(self) -> Optional[List[str]]:
+        """Criterion names when "require" is a plain AND of criteria, else None."""
+        if isinstance(self.require_spec, str):
+            return [self.require_spec]
+        names = self.require_spec.get('all') if isinstance(self.require_spec, dict) else None
+        if isinstance(names, list) and all(isinstance(name, str) for name in names):
+            return names
+        return None
+
+    def record_keys(self) -> tuple:
+        """Record keys the criteria may read (fields and their aliases)."""
+        keys = []
+        for criterion in self.criteria.values():
+            for field in criterion.fields:
+                keys.extend(FIELD_ALIASES.get(field, (field,)))
+        return tuple(dict.fromkeys(keys))
+
+    def checker(self, record: Dict[str, Any]) -> RecordCheck:
+        """Criterion -> result for one record."""
+        return RecordCheck(record)
+
+    def matches(self, record: Dict[str, Any]) -> bool:
+        """True if the record satisfies the require expression."""
+        return self.require(self.checker(record))
+
+    def evaluate(self, record: Dict[str, Any]) -> Dict[str, bool]:
+        """Result of every criterion (including report-only ones) and of the filter, under 'matches'."""
+        check = self.checker(record)
+        results = {name: check(criterion) for name, criterion in self.criteria.items()}
+        results['matches'] = self.require(check)
+        return results
+
+    def predicate(self, name: str) -> Callable[[Dict[str, Any]], bool]:
+        """Record predicate for a single criterion."""
+        criterion = self.criteria.get(name)
+        if criterion is None:
+            raise ValueError(f"Filter '{self.name}' has no criterion '{name}'")
+        return lambda record: self.checker(record)(criterion)
+
+    def matched_terms(self, record: Dict[str, Any]) -> Dict[str, Set[str]]:
+        """Terms each criterion found in a record, for criteria that found any."""
+        check = self.checker(record)
+        found = {name: criterion.matched_terms(check.text(criterion.fields, criterion.separator))
+                 for name, criterion in self.criteria.items()}
+        return {name: terms for name, terms in found.items() if terms}
+
+    def describe(self) -> str:
+        """Human-readable summary of the spec."""
+        lines = [f"Filter '{self.name}'" + (f": {self.description}" if self.description else "")]
+        for name, criterion in self.criteria.items():
+            how = "instrument family" if criterion.mode == 'family' else f"{criterion.mode} of"
+            where = ', '.join(criterion.fields) + (", each separately" if criterion.separator == '\n' else "")
+            lines.append(f"  {name} ({how} {len(criterion.terms)} terms in {where}): "
+                         f"{', '.join(criterion.terms)}")
+        lines.append(f"  require: {json.dumps(self.require_spec)}")
+        if self.plan != self.require_spec:
+            lines.append(f"  evaluated as: {json.dumps(self.plan)}")
+        return "\n".join(lines)
+
+
+class CriterionStats:
+    """
+    Measured cost and pass rate of each criterion of a filter.
+
+    Collected by running every criterion on a sample of records (measure),
+    and saved to / loaded from a JSON file so later runs over the same data
+    can skip the sampling. Costs are per criterion run on its own, field
+    rendering included.
+    """
+
+    def __init__(self, dataset_filter: DatasetFilter):
+        self.filter = dataset_filter
+        self.records = 0
+        self.passes = dict.fromkeys(dataset_filter.criteria, 0)
+        self.seconds = dict.fromkeys(dataset_filter.criteria, 0.0)
+
+    def measure(self, record: Dict[str, Any]) -> Dict[str, bool]:
+        """Evaluate a record like DatasetFilter.evaluate, timing each criterion."""
+        check = self.filter.checker(record)
+        results = {}
+        for name, criterion in self.filter.criteria.items():
+            began = time.perf_counter()
+            result = criterion.test(RecordCheck(record).text(criterion.fields, criterion.separator))
+            self.seconds[name] += time.perf_counter() - began
+            results[name] = check.results[criterion.key] = result
+            if result:
+                self.passes[name] += 1
+        self.records += 1
+        results['matches'] = self.filter.require(check)
+        return results
+
+    def cost(self, name: str) -> float:
+        """Mean seconds per evaluation of a criterion."""
+        return self.seconds[name] / self.records if self.records else 0.0
+
+    def pass_rate(self, name: str) -> float:
+        """Fraction of the measured records passing a criterion (0.5 before any)."""
+        return self.passes[name] / self.records if self.records else 0.5
+
+    def signatures(self) -> Dict[str, Any]:
+        """Definition of each criterion, so saved stats are not applied to a changed spec."""
+        return {name: [list(criterion.fields), criterion.separator == '\n', criterion.mode, sorted(criterion.terms)]
+                for name, criterion in self.filter.criteria.items()}
+
+    def save(self, filename: str) -> None:
+        """Write the stats to a JSON file."""
+        data = {
+            'filter': self.filter.name,
+            'records': self.records,
+            'criteria': {
+                name: {'definition': definition, 'passes': self.passes[name], 'seconds': self.seconds[name]}
+                for name, definition in self.signatures().items()
+            },
+        }
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+
+    @classmethod
+    def load(cls, filename: str, dataset_filter: DatasetFilter) -> Optional['CriterionStats']:
+        """
+        Read stats saved by save().
+
+        Returns:
+            The stats, or None if the file is missing or was written for
+            different criteria
+        """
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        stats = cls(dataset_filter)
+        saved = data.get('criteria') or {}
+        if (data.get('filter') != dataset_filter.name or not data.get('records')
+                or {name: entry.get('definition') for name, entry in saved.items()} != stats.signatures()):
+            return None
+        stats.records = data['records']
+        for name, entry in saved.items():
+            stats.passes[name] = entry['passes']
+            stats.seconds[name] = entry['seconds']
+        return stats
+
+
+class FilterSet:
+    """
+    Several filters (profiles) evaluated together in one pass over the records.
+
+    The terms of all criteria searching the same text are merged into one
+    matcher, so each record's fields are rendered, lowercased and scanned
+    once for every profile, and criteria defined identically in several
+    profiles are evaluated once. The profiles' instrument criteria share one
+    normalizer cache.
+    """
+
+    def __init__(self, filters: Iterable[DatasetFilter]):
+        self.filters = list(filters)
+        self.normalizer = InstrumentNormalizer()
+        terms: Dict[tuple, List[str]] = {}
+        for dataset_filter in self.filters:
+            dataset_filter.normalizer = self.normalizer
+            for criterion in dataset_filter.criteria.values():
+                if criterion.mode == 'family':
+                    criterion.normalizer = self.normalizer
+                else:
+                    terms.setdefault((criterion.fields, criterion.separator), []).extend(criterion.term_set)
+        self.matchers = {source: KeywordMatcher(group) for source, group in terms.items()}
+
+    def route(self, record: Dict[str, Any]) -> List[int]:
+        """Indexes of the filters the record satisfies."""
+        check = RecordCheck(record, self.matchers)
+        return [i for i, dataset_filter in enumerate(self.filters) if dataset_filter.require(check)]
+
+
+def load_filter_spec(source: str) -> Dict[str, Any]:
+    """
+    Load a filter spec by built-in name or from a JSON file.
+
+    Raises:
+        ValueError: The source is neither a built-in spec nor an existing file
+    """
+    if source in BUILTIN_SPECS:
+        return BUILTIN_SPECS[source]
+    if not os.path.exists(source):
+        raise ValueError(f"No filter spec '{source}' (built-in specs: {', '.join(BUILTIN_SPECS)})")
+    with open(source, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_filter(source: str) -> DatasetFilter:
+    """Compile a filter spec given by built-in name or JSON file path."""
+    return DatasetFilter(load_filter_spec(source))
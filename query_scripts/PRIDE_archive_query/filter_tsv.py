@@ -5,320 +5,149 @@ Ultra-Strict TSV Filter for Immunopeptidomics Datasets
 This script filters the converted TSV file to find ONLY immunopeptidomics datasets
 that are cancer-related and analyzed on timsTOF instruments.
 Cancer keywords are ONLY searched in the keywords field, not in title or description.
+
+The criteria are the 'ultra-strict' spec of the shared filter engine
+(filter_engine.py); --filter-spec runs any other spec on the TSV instead.
+With one or more --profile options the TSV is read once and every row is
+written to the output of each profile it satisfies (see filter_profiles).
+
+With --short-circuit the required criteria are evaluated cheapest and most
+selective first and a row is dropped at its first failing criterion, so the
+description scans are skipped for rows without a timsTOF instrument. The
+order comes from timing every criterion on the first --sample-rows rows (or
+from a --stats-cache file written by an earlier run); the per-criterion
+counts reported are then those of the sample.
 """
 
+import argparse
 import csv
+import json
+import os
 import re
 import sys
-from typing import List, Dict, Any
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from compressed_input import open_text_input
+from filter_engine import BUILTIN_SPECS, CriterionStats, DatasetFilter, FilterSet, load_filter_spec
+
+DEFAULT_SPEC = 'ultra-strict'
+# Rows on which every criterion is timed before --short-circuit orders them
+SAMPLE_ROWS = 2000
 
 class UltraStrictTSVFilter:
     """Class to ultra-strictly filter TSV datasets for immunopeptidomics only."""
-    
-    def __init__(self):
-        # timsTOF instrument variants
-        self.timstof_patterns = [
-            r'timsTOF',
-            r'timsTOF\s+Pro',
-            r'timsTOF\s+Pro\s+2',
-            r'timsTOF\s+SCP',
-            r'timsTOF\s+HT',
-            r'timsTOF\s+Flex',
-            r'timsTOF\s+Ultra',
-            r'timsTOF\s+Elite',
-            r'timsTOF\s+Discovery'
-        ]
-        
-        # STRICT immunopeptidomics keywords (must contain these)
-        self.immunopeptidomics_keywords = [
-            'immunopeptidomics',
-            'immunopeptidomic',
-            'immunopeptidome',
-            'immunopeptide',
-            'hla peptidome',
-            'mhc peptidome',
-            'antigen presentation',
-            'peptide presentation',
-            't cell epitope',
-            'cd8 epitope',
-            'cd4 epitope',
-            'hla class i',
-            'hla class ii',
-            'mhc class i',
-            'mhc class ii',
-            'hla-i',
-            'hla-ii',
-            'mhc-i',
-            'mhc-ii',
-            'human leukocyte antigen peptidome',
-            'major histocompatibility complex peptidome'
-        ]
-        
-        # Cancer-related keywords (ONLY searched in keywords field)
-        self.cancer_keywords = [
-            'cancer',
-            'tumour',
-            'tumor',
-            'malignant',
-            'benign',
-            'oncology',
-            'neoplasm',
-            'carcinoma',
-            'sarcoma',
-            'leukemia',
-            'lymphoma',
-            'melanoma',
-            'glioblastoma',
-            'adenocarcinoma',
-            'metastasis',
-            'metastatic',
-            'cancerous',
-            'tumorous',
-            'neuroblastoma',
-            'oral cancer',
-            'breast cancer',
-            'lung cancer',
-            'prostate cancer',
-            'colorectal cancer',
-            'pancreatic cancer',
-            'ovarian cancer',
-            'cervical cancer',
-            'endometrial cancer',
-            'thyroid cancer',
-            'brain cancer',
-            'bone cancer',
-            'skin cancer',
-            'stomach cancer',
-            'esophageal cancer',
-            'head and neck cancer',
-            'testicular cancer',
-            'adrenal cancer'
-        ]
-        
-        # Terms to EXCLUDE (general proteomics, phosphoproteomics, etc.)
-        self.exclude_terms = [
-            'proteomics',
-            'proteomic',
-            'phosphoproteomics',
-            'phosphoproteomic',
-            'glycoproteomics',
-            'glycoproteomic',
-            'acetylproteomics',
-            'acetylproteomic',
-            'ubiquitinomics',
-            'ubiquitinomic',
-            'metabolomics',
-            'metabolomic',
-            'lipidomics',
-            'lipidomic',
-            'transcriptomics',
-            'transcriptomic',
-            'genomics',
-            'genomic',
-            'epigenomics',
-            'epigenomic',
-            'phosphorylation',
-            'glycosylation',
-            'acetylation',
-            'ubiquitination',
-            'methylation',
-            'sumoylation',
-            'palmitoylation',
-            'myristoylation',
-            'farnesylation',
-            'geranylation'
-        ]
-
-    def check_timstof_instrument(self, instruments_str: str) -> bool:
-        """
-        Check if the instruments string contains timsTOF.
-        
-        Args:
-            instruments_str: Instruments field from TSV
-            
-        Returns:
-            True if timsTOF is found, False otherwise
-        """
-        if not instruments_str:
-            return False
-        
-        instruments_lower = instruments_str.lower()
-        
-        # Check for any timsTOF pattern
-        for pattern in self.timstof_patterns:
-            if re.search(pattern, instruments_lower, re.IGNORECASE):
-                return True
-        
-        return False
 
-    def check_strict_immunopeptidomics(self, keywords_str: str, title_str: str = "", description_str: str = "") -> bool:
-        """
-        Check if the dataset is STRICTLY immunopeptidomics (not general proteomics).
-        Searches keywords, title, and description for immunopeptidomics terms.
-        Allows datasets that contain BOTH immunopeptidomics AND other omics terms.
-        
-        Args:
-            keywords_str: Keywords field from TSV
-            title_str: Title field from TSV
-            description_str: Description field from TSV
-            
-        Returns:
-            True if immunopeptidomics keywords are found, False otherwise
-        """
-        # Combine all text fields for searching
-        search_text = f"{keywords_str} {title_str} {description_str}".lower()
-        
-        # First, check if immunopeptidomics terms are present
-        has_immunopeptidomics = False
-        for keyword in self.immunopeptidomics_keywords:
-            if keyword.lower() in search_text:
-                has_immunopeptidomics = True
-                break
-        
-        # If no immunopeptidomics terms found, reject the dataset
-        if not has_immunopeptidomics:
-            return False
-        
-        # If immunopeptidomics is present, allow other omics terms
-        # Only exclude if it's PURELY other omics without immunopeptidomics
-        other_omics_found = []
-        for exclude_term in self.exclude_terms:
-            if exclude_term.lower() in search_text:
-                other_omics_found.append(exclude_term)
-        
-        # If we have immunopeptidomics AND other omics, that's OK
-        # If we have ONLY other omics (no immunopeptidomics), that's NOT OK
-        if other_omics_found and has_immunopeptidomics:
-            # This is acceptable - dataset has both immunopeptidomics and other omics
-            return True
-        elif other_omics_found and not has_immunopeptidomics:
-            # This is NOT acceptable - dataset has only other omics, no immunopeptidomics
-            return False
-        else:
-            # Only immunopeptidomics, no other omics - this is acceptable
-            return True
+    def __init__(self, spec: Optional[Dict[str, Any]] = None):
+        # Compiled once; every row goes through the same predicate
+        self.filter = DatasetFilter(spec or BUILTIN_SPECS[DEFAULT_SPEC])
 
-    def check_cancer_keywords_only(self, keywords_str: str) -> bool:
-        """
-        Check if cancer-related keywords are present ONLY in the keywords field.
-        
-        Args:
-            keywords_str: Keywords field from TSV
-            
-        Returns:
-            True if cancer keywords are found in keywords field, False otherwise
-        """
-        if not keywords_str:
-            return False
-        
-        keywords_lower = keywords_str.lower()
-        
-        # Check for cancer keywords ONLY in keywords field
-        for keyword in self.cancer_keywords:
-            if keyword.lower() in keywords_lower:
-                return True
-        
-        return False
-
-    def filter_datasets(self, input_filename: str, output_filename: str) -> bool:
+    def filter_datasets(self, input_filename: str, output_filename: str, short_circuit: bool = False,
+                        sample_rows: int = SAMPLE_ROWS, stats_cache: Optional[str] = None) -> bool:
         """
         Filter datasets based on ultra-strict criteria and save to new TSV file.
-        
+
         Args:
             input_filename: Input TSV file
             output_filename: Output filtered TSV file
-            
+            short_circuit: Evaluate the required criteria in measured cost and
+                selectivity order, stopping at the first failure; criterion
+                counts then cover only the sampled rows
+            sample_rows: Rows on which to measure the criteria in short_circuit mode
+            stats_cache: JSON file with the measurements of an earlier run; used
+                if it matches the filter, else written after sampling
+
         Returns:
             True if successful, False otherwise
         """
         try:
             print(f"ULTRA-STRICT Filtering of datasets from {input_filename}")
             print("=" * 70)
-            print("ULTRA-STRICT Search criteria:")
-            print("- Instruments MUST contain 'timsTOF'")
-            print("- MUST contain immunopeptidomics terms (NOT general proteomics)")
-            print("- Cancer keywords MUST be in keywords field ONLY (not title/description)")
-            print("- EXCLUDES: proteomics, phosphoproteomics, glycoproteomics, etc.")
+            print(f"ULTRA-STRICT Search criteria ({self.filter.name}):")
+            print(f"- {self.filter.description or 'see the criteria summary above'}")
             print("=" * 70)
-            
+
             filtered_datasets = []
             total_datasets = 0
-            timstof_count = 0
-            immunopeptidomics_count = 0
-            cancer_keywords_count = 0
-            excluded_count = 0
+            # Rows passing each criterion, report-only criteria included
+            criterion_counts = dict.fromkeys(self.filter.criteria, 0)
             all_criteria_count = 0
-            
-            with open(input_filename, 'r', encoding='utf-8') as infile:
+
+            stats = None
+            ordered = False
+            if short_circuit:
+                stats = CriterionStats.load(stats_cache, self.filter) if stats_cache else None
+                if stats is not None:
+                    print(f"Criterion statistics of {stats.records} rows read from {stats_cache}")
+                    self.order_criteria(stats)
+                    ordered = True
+                else:
+                    stats = CriterionStats(self.filter)
+
+            with open_text_input(input_filename, background=True) as infile:
                 reader = csv.DictReader(infile, delimiter='\t')
-                
+
                 # Get field names
                 fieldnames = reader.fieldnames
-                
+
                 for row in reader:
                     total_datasets += 1
-                    
+
                     if total_datasets % 10000 == 0:
                         print(f"Processed {total_datasets} datasets...")
-                    
-                    # Extract relevant fields
-                    instruments = row.get('instruments', '')
-                    keywords = row.get('keywords', '')
-                    title = row.get('title', '')
-                    description = row.get('projectDescription', '')
-                    
-                    # Check criteria
-                    has_timstof = self.check_timstof_instrument(instruments)
-                    is_immunopeptidomics = self.check_strict_immunopeptidomics(keywords, title, description)
-                    has_cancer_keywords = self.check_cancer_keywords_only(keywords)
-                    
-                    if has_timstof:
-                        timstof_count += 1
-                    if is_immunopeptidomics:
-                        immunopeptidomics_count += 1
-                    if has_cancer_keywords:
-                        cancer_keywords_count += 1
-                    
-                    # Check if dataset was excluded due to general proteomics terms
-                    search_text = f"{keywords} {title} {description}".lower()
-                    excluded = any(exclude_term.lower() in search_text for exclude_term in self.exclude_terms)
-                    if excluded:
-                        excluded_count += 1
-                    
-                    # Only include datasets that match ALL THREE criteria
-                    if has_timstof and is_immunopeptidomics and has_cancer_keywords:
+
+                    if ordered:
+                        # Stops at the first failing criterion
+                        matched = self.filter.matches(row)
+                    else:
+                        # Check criteria
+                        results = stats.measure(row) if stats is not None else self.filter.evaluate(row)
+                        for name in criterion_counts:
+                            if results[name]:
+                                criterion_counts[name] += 1
+                        matched = results['matches']
+                        if stats is not None and stats.records >= sample_rows:
+                            self.order_criteria(stats)
+                            ordered = True
+                            if stats_cache:
+                                stats.save(stats_cache)
+
+                    # Only include datasets that match the required criteria
+                    if matched:
                         all_criteria_count += 1
                         filtered_datasets.append(row)
                         print(f"Found ULTRA-STRICT matching dataset: {row.get('accession', 'Unknown')}")
-                        print(f"  Title: {title[:100]}...")
-                        print(f"  Keywords: {keywords}")
-            
+                        print(f"  Title: {row.get('title', '')[:100]}...")
+                        print(f"  Keywords: {row.get('keywords', '')}")
+                        terms_found = self.filter.matched_terms(row)
+                        if terms_found:
+                            print("  Matched terms: " + "; ".join(f"{name}: {', '.join(sorted(terms))}"
+                                                                for name, terms in terms_found.items()))
+
+            if stats is not None and not ordered and stats_cache:
+                # Fewer rows than the sample: the measurements cover the whole input
+                stats.save(stats_cache)
+
             # Save filtered datasets
             if filtered_datasets:
                 with open(output_filename, 'w', newline='', encoding='utf-8') as outfile:
                     writer = csv.DictWriter(outfile, fieldnames=fieldnames, delimiter='\t')
                     writer.writeheader()
                     writer.writerows(filtered_datasets)
-                
+
                 print(f"\nULTRA-STRICT Filtering complete!")
-                print(f"Total datasets processed: {total_datasets}")
-                print(f"Datasets with timsTOF: {timstof_count}")
-                print(f"Datasets with immunopeptidomics (strict): {immunopeptidomics_count}")
-                print(f"Datasets with cancer keywords (keywords field only): {cancer_keywords_count}")
-                print(f"Datasets excluded (general proteomics): {excluded_count}")
-                print(f"Datasets matching ALL THREE criteria: {all_criteria_count}")
+                self.report_counts(total_datasets, criterion_counts, stats)
+                print(f"Datasets matching ALL required criteria: {all_criteria_count}")
+                self.filter.normalizer.report_cache()
                 print(f"Filtered datasets saved to: {output_filename}")
-                
+
                 return True
             else:
-                print(f"\nNo datasets found matching ALL THREE ultra-strict criteria.")
-                print(f"Total datasets processed: {total_datasets}")
-                print(f"Datasets with timsTOF: {timstof_count}")
-                print(f"Datasets with immunopeptidomics (strict): {immunopeptidomics_count}")
-                print(f"Datasets with cancer keywords (keywords field only): {cancer_keywords_count}")
-                print(f"Datasets excluded (general proteomics): {excluded_count}")
+                print(f"\nNo datasets found matching ALL ultra-strict criteria.")
+                self.report_counts(total_datasets, criterion_counts, stats)
+                self.filter.normalizer.report_cache()
                 return False
-                
+
         except FileNotFoundError:
             print(f"Error: File '{input_filename}' not found.")
             return False
@@ -326,47 +155,181 @@ class UltraStrictTSVFilter:
             print(f"Error filtering datasets: {e}")
             return False
 
+    def order_criteria(self, stats: CriterionStats):
+        """Switch to short-circuit evaluation in the order the stats suggest."""
+        plan = self.filter.order_by(stats)
+        print(f"Evaluating criteria as {json.dumps(plan)} "
+              f"(per row: " + ", ".join(f"{name} {stats.cost(name) * 1e6:.1f}us, "
+                                        f"{stats.pass_rate(name):.1%} pass"
+                                        for name in self.filter.criteria) + ")")
+
+    def report_counts(self, total_datasets: int, criterion_counts: Dict[str, int],
+                      stats: Optional[CriterionStats] = None):
+        """Print how many datasets passed each criterion (in the sample, in short-circuit mode)."""
+        print(f"Total datasets processed: {total_datasets}")
+        if stats is not None:
+            print(f"Criterion counts below are for the {stats.records} sampled rows "
+                  f"(short-circuit mode skips the other criteria)")
+            for name in criterion_counts:
+                print(f"{self.filter.criteria[name].label}: {stats.passes[name]}")
+            return
+        for name, count in criterion_counts.items():
+            print(f"{self.filter.criteria[name].label}: {count}")
+
     def print_criteria_summary(self):
         """Print a summary of the ultra-strict filtering criteria."""
-        print("\nULTRA-STRICT Immunopeptidomics Keywords (searched in keywords, title, description):")
-        for keyword in self.immunopeptidomics_keywords:
-            print(f"  - {keyword}")
-        
-        print("\nCancer Keywords (ONLY searched in keywords field):")
-        for keyword in self.cancer_keywords:
-            print(f"  - {keyword}")
-        
-        print("\nLogic for Other Omics Terms:")
-        print("  - If dataset contains immunopeptidomics AND other omics → ACCEPT")
-        print("  - If dataset contains ONLY other omics (no immunopeptidomics) → REJECT")
-        print("  - If dataset contains ONLY immunopeptidomics (no other omics) → ACCEPT")
-        
-        print("\nOther Omics Terms (will be allowed if immunopeptidomics is also present):")
-        for term in self.exclude_terms:
-            print(f"  - {term}")
+        print()
+        print(self.filter.describe())
+
+def profile_output_name(name: str) -> str:
+    """Default output file of a profile given without one."""
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', name) + "_filtered.tsv"
+
+
+def parse_profile(argument: str) -> Tuple[str, Optional[str]]:
+    """Split a --profile SPEC[=OUTPUT] argument."""
+    spec, _, output = argument.partition('=')
+    return spec, output or None
+
+
+def filter_profiles(input_filename: str, profiles: List[Tuple[Dict[str, Any], str]]) -> bool:
+    """
+    Filter a TSV for several profiles in one pass.
+
+    The input is read and each row's text lowercased and scanned once for
+    all profiles (see filter_engine.FilterSet); each row is appended to the
+    output of every profile it satisfies. A profile's output is written only
+    if some row matched it, as in the single-profile mode.
+
+    Args:
+        input_filename: Input TSV file
+        profiles: (filter spec, output TSV file) per profile
+
+    Returns:
+        True if any profile matched a dataset, False otherwise
+    """
+    filter_set = FilterSet(DatasetFilter(spec) for spec, _ in profiles)
+    outputs = [output for _, output in profiles]
+    counts = [0] * len(outputs)
+    open_files = []
+    writers: List[Optional[csv.DictWriter]] = [None] * len(outputs)
+    total_datasets = 0
+
+    try:
+        print(f"Filtering datasets from {input_filename} for {len(outputs)} profiles in one pass")
+        print("=" * 70)
+        for dataset_filter, output in zip(filter_set.filters, outputs):
+            print(f"- {dataset_filter.name} -> {output}")
+        print("=" * 70)
+
+        with open_text_input(input_filename, background=True) as infile:
+            reader = csv.DictReader(infile, delimiter='\t')
+            fieldnames = reader.fieldnames
+
+            for row in reader:
+                total_datasets += 1
+
+                if total_datasets % 10000 == 0:
+                    print(f"Processed {total_datasets} datasets...")
+
+                for i in filter_set.route(row):
+                    writer = writers[i]
+                    if writer is None:
+                        outfile = open(outputs[i], 'w', newline='', encoding='utf-8')
+                        open_files.append(outfile)
+                        writer = writers[i] = csv.DictWriter(outfile, fieldnames=fieldnames, delimiter='\t')
+                        writer.writeheader()
+                    writer.writerow(row)
+                    counts[i] += 1
+
+    except FileNotFoundError:
+        print(f"Error: File '{input_filename}' not found.")
+        return False
+    except Exception as e:
+        print(f"Error filtering datasets: {e}")
+        return False
+    finally:
+        for outfile in open_files:
+            outfile.close()
+
+    print(f"\nFiltering complete!")
+    print(f"Total datasets processed: {total_datasets}")
+    for dataset_filter, output, count in zip(filter_set.filters, outputs, counts):
+        saved = f"saved to {output}" if count else "no output written"
+        print(f"{dataset_filter.name}: {count} datasets ({saved})")
+    filter_set.normalizer.report_cache()
+    return any(counts)
+
 
 def main():
     """Main function."""
-    if len(sys.argv) < 2:
-        print("Usage: python ultra_strict_tsv_filter.py <input_tsv> [output_tsv]")
-        print("  <input_tsv>: Path to the input TSV file")
-        print("  [output_tsv]: Optional output TSV file path (default: ultra_strict_filtered_ip_data.tsv)")
-        print("\nExample:")
-        print("  python ultra_strict_tsv_filter.py pride_datasets.tsv")
-        print("  python ultra_strict_tsv_filter.py pride_datasets.tsv my_ultra_strict_filtered_data.tsv")
+    arg_parser = argparse.ArgumentParser(description="Ultra-strict filter for converted PRIDE TSV files.")
+    arg_parser.add_argument('input_tsv', help="Path to the input TSV file (plain or gzip/bz2/xz/zstd-compressed)")
+    arg_parser.add_argument('output_tsv', nargs='?',
+                            help="Output TSV file path (default: ultra_strict_filtered_ip_data.tsv)")
+    arg_parser.add_argument('--filter-spec',
+                            help=f"Built-in filter spec ({', '.join(BUILTIN_SPECS)}) or JSON spec file "
+                                 f"(see filter_engine.py; default: {DEFAULT_SPEC})")
+    arg_parser.add_argument('--profile', action='append', metavar='SPEC[=OUTPUT]',
+                            help="Filter for this spec (built-in name or JSON file) in a single pass together "
+                                 "with the other --profile options; repeatable. OUTPUT defaults to "
+                                 "<spec name>_filtered.tsv")
+    arg_parser.add_argument('--short-circuit', action='store_true',
+                            help="Evaluate the required criteria cheapest and most selective first, "
+                                 "stopping at the first failure (criterion counts then cover the sample only)")
+    arg_parser.add_argument('--sample-rows', type=int,
+                            help=f"Rows on which --short-circuit times the criteria (default: {SAMPLE_ROWS})")
+    arg_parser.add_argument('--stats-cache', metavar='FILE',
+                            help="JSON file for the --short-circuit measurements: read if it matches the "
+                                 "filter, written after sampling otherwise")
+    args = arg_parser.parse_args()
+
+    input_file = args.input_tsv
+
+    if args.profile:
+        if args.output_tsv:
+            arg_parser.error("give the outputs of --profile as SPEC=OUTPUT, not as output_tsv")
+        if args.filter_spec:
+            arg_parser.error("--filter-spec does not apply with --profile; give the spec as --profile SPEC")
+        if args.short_circuit or args.sample_rows is not None or args.stats_cache:
+            arg_parser.error("--short-circuit, --sample-rows and --stats-cache do not apply with --profile")
+        profiles = []
+        try:
+            for argument in args.profile:
+                source, output = parse_profile(argument)
+                spec = load_filter_spec(source)
+                name = spec.get('name') or os.path.splitext(os.path.basename(source))[0]
+                profiles.append((spec, output or profile_output_name(name)))
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        duplicates = [output for output, count in Counter(output for _, output in profiles).items() if count > 1]
+        if duplicates:
+            print(f"Error: several profiles write to {', '.join(sorted(duplicates))}")
+            sys.exit(1)
+        if not filter_profiles(input_file, profiles):
+            print("Multi-profile filtering failed.")
+            sys.exit(1)
         return
-    
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else "ultra_strict_filtered_ip_data.tsv"
-    
-    filter_tool = UltraStrictTSVFilter()
-    
+
+    output_file = args.output_tsv or "ultra_strict_filtered_ip_data.tsv"
+    if not args.short_circuit and (args.sample_rows is not None or args.stats_cache):
+        arg_parser.error("--sample-rows and --stats-cache only apply with --short-circuit")
+    sample_rows = args.sample_rows if args.sample_rows is not None else SAMPLE_ROWS
+
+    try:
+        filter_tool = UltraStrictTSVFilter(load_filter_spec(args.filter_spec or DEFAULT_SPEC))
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
     # Show criteria summary
     filter_tool.print_criteria_summary()
-    
+
     # Filter datasets
-    success = filter_tool.filter_datasets(input_file, output_file)
-    
+    success = filter_tool.filter_datasets(input_file, output_file, args.short_circuit,
+                                          sample_rows, args.stats_cache)
+
     if success:
         print(f"\nULTRA-STRICT filtering completed successfully!")
         print(f"Output file: {output_file}")
@@ -375,4 +338,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
+    main()
@@ -0,0 +1,123 @@
+"""
+Canonical instrument models for the `instruments` column of converted TSVs.
+
+The column holds instrument names joined with '; ' (see
+updated_json_parser.format_field_value), written however the submitter
+spelled them: "timsTOF Pro", "TIMSTOF PRO 2", "timsTOF fleX", ... The
+variant table below is compiled once into a single case-insensitive regex
+that maps each name to a canonical model and its family. Instrument strings
+repeat heavily across a dump, so each distinct string is resolved once and
+remembered; family checks on repeated values are a dictionary lookup.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+# (canonical model, family, regex for the spellings of the model). Where
+# one model's name extends another's, the longer one comes first, since
+# the first alternative matching at a position wins.
+INSTRUMENT_VARIANTS = [
+    ('timsTOF Pro 2', 'timsTOF', r'timstof\s*pro\s*2'),
+    ('timsTOF Pro', 'timsTOF', r'timstof\s*pro'),
+    ('timsTOF SCP', 'timsTOF', r'timstof\s*scp'),
+    ('timsTOF HT', 'timsTOF', r'timstof\s*ht'),
+    ('timsTOF fleX', 'timsTOF', r'timstof\s*flex'),
+    ('timsTOF Ultra 2', 'timsTOF', r'timstof\s*ultra\s*2'),
+    ('timsTOF Ultra', 'timsTOF', r'timstof\s*ultra'),
+    ('timsTOF Elite', 'timsTOF', r'timstof\s*elite'),
+    ('timsTOF Discovery', 'timsTOF', r'timstof\s*discovery'),
+    # Any other spelling containing "timsTOF", as the filters have always accepted
+    ('timsTOF', 'timsTOF', r'timstof'),
+    ('Q Exactive HF-X', 'Orbitrap', r'q[\s-]*exactive\s*hf[\s-]*x'),
+    ('Q Exactive HF', 'Orbitrap', r'q[\s-]*exactive\s*hf'),
+    ('Q Exactive Plus', 'Orbitrap', r'q[\s-]*exactive\s*plus'),
+    ('Q Exactive', 'Orbitrap', r'q[\s-]*exactive'),
+    ('Orbitrap Fusion Lumos', 'Orbitrap', r'orbitrap\s*fusion\s*lumos'),
+    ('Orbitrap Fusion', 'Orbitrap', r'orbitrap\s*fusion'),
+    ('Orbitrap Eclipse', 'Orbitrap', r'orbitrap\s*eclipse'),
+    ('Orbitrap Exploris 480', 'Orbitrap', r'orbitrap\s*exploris\s*480'),
+    ('Orbitrap Exploris 240', 'Orbitrap', r'orbitrap\s*exploris\s*240'),
+    ('Orbitrap Exploris', 'Orbitrap', r'orbitrap\s*exploris'),
+    ('Orbitrap Astral', 'Orbitrap', r'orbitrap\s*astral'),
+    ('LTQ Orbitrap Velos', 'Orbitrap', r'ltq\s*orbitrap\s*velos'),
+    ('LTQ Orbitrap Elite', 'Orbitrap', r'ltq\s*orbitrap\s*elite'),
+    ('LTQ Orbitrap XL', 'Orbitrap', r'ltq\s*orbitrap\s*xl'),
+    ('LTQ Orbitrap', 'Orbitrap', r'ltq\s*orbitrap'),
+    ('Orbitrap Elite', 'Orbitrap', r'orbitrap\s*elite'),
+    ('Orbitrap', 'Orbitrap', r'orbitrap'),
+    ('TripleTOF 6600', 'TripleTOF', r'triple\s*tof\s*6600'),
+    ('TripleTOF 5600', 'TripleTOF', r'triple\s*tof\s*5600'),
+    ('TripleTOF', 'TripleTOF', r'triple\s*tof'),
+    ('ZenoTOF 7600', 'ZenoTOF', r'zeno\s*tof\s*7600'),
+    ('Synapt', 'Synapt', r'synapt'),
+]
+
+# Family of an instrument string with no known model
+UNKNOWN_FAMILY = ''
+
+
+class InstrumentNormalizer:
+    """Maps instrument strings to canonical models and families, remembering each distinct string."""
+
+    def __init__(self, variants: Iterable[Tuple[str, str, str]] = INSTRUMENT_VARIANTS):
+        variants = list(variants)
+        self.models = [(model, family) for model, family, _ in variants]
+        # One named group per model; the group that matched identifies it
+        self.pattern = re.compile('|'.join(f'(?P<m{i}>{pattern})' for i, (_, _, pattern) in enumerate(variants)),
+                                  re.IGNORECASE)
+        self.group_models = {f'm{i}': model for i, model in enumerate(self.models)}
+        self.cache: Dict[str, Tuple[Tuple[str, ...], FrozenSet[str]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _resolve(self, instruments: str) -> Tuple[Tuple[str, ...], FrozenSet[str]]:
+        """Canonical models and families of the names in one instruments string."""
+        models = []
+        families = set()
+        for name in instruments.split(';'):
+            name = name.strip()
+            if not name:
+                continue
+            # A free-text name can mention several instruments
+            found = [self.group_models[match.lastgroup] for match in self.pattern.finditer(name)]
+            for model, family in found or [(name, UNKNOWN_FAMILY)]:
+                if model not in models:
+                    models.append(model)
+                families.add(family)
+        return tuple(models), frozenset(families)
+
+    def lookup(self, instruments: Optional[str]) -> Tuple[Tuple[str, ...], FrozenSet[str]]:
+        """
+        Resolve an instruments string, from the cache when it was seen before.
+
+        Args:
+            instruments: Instrument names separated by ';'
+
+        Returns:
+            (canonical models in order of appearance, their families); names
+            not in the variant table are kept as written, with UNKNOWN_FAMILY
+        """
+        if not instruments:
+            return (), frozenset()
+        resolved = self.cache.get(instruments)
+        if resolved is None:
+            self.misses += 1
+            resolved = self.cache[instruments] = self._resolve(instruments)
+        else:
+            self.hits += 1
+        return resolved
+
+    def normalize(self, instruments: Optional[str]) -> str:
+        """Canonical models of an instruments string, joined like the TSV column."""
+        return "; ".join(self.lookup(instruments)[0])
+
+    def is_family(self, instruments: Optional[str], family: str) -> bool:
+        """True if any instrument in the string belongs to the family."""
+        return family in self.lookup(instruments)[1]
+
+    def report_cache(self) -> None:
+        """Print how often instrument strings were answered from the cache."""
+        lookups = self.hits + self.misses
+        if lookups:
+            print(f"Instrument strings: {len(self.cache)} distinct, "
+                  f"{self.hits}/{lookups} lookups cached ({self.hits / lookups:.1%})")
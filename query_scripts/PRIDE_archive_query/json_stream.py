@@ -0,0 +1,479 @@
+"""
+Fast splitting of large PRIDE dumps into top-level JSON object strings.
+
+Reads the input in large blocks and jumps from one structural character
+(quote, backslash, brace) to the next with compiled regexes, building each
+object from block slices instead of appending one character at a time.
+Inside an object only braces and backslashes are visited, located with
+str.find(); whether a brace sits inside a string follows from the parity of
+the quotes skipped over, which str.count() tallies at C speed. The object
+boundaries are exactly those of the original per-character loop in
+StreamingJSONParser (including its handling of text between objects).
+
+iter_decoded_objects() goes one step further and decodes the objects with
+json.JSONDecoder.raw_decode as it walks a sliding text window, so each byte
+is scanned once; the brace scanner only runs on objects that fail to decode.
+
+Uncompressed files can also be memory-mapped: iter_object_spans() runs the
+same scan over the raw bytes in place and returns byte ranges, so only the
+object currently being decoded is ever copied out of the mapping.
+"""
+
+import codecs
+import json
+import mmap
+import re
+from contextlib import contextmanager
+from typing import IO, Any, Iterable, Iterator, List, Optional, Tuple
+
+from compressed_input import detect_compression, open_text_input
+
+# Characters that change the scanner state outside / inside strings
+_STRUCTURAL = re.compile(r'["\\{}]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+# Whitespace and separators allowed between the items of an array
+_ITEM_GAP = re.compile(r'[\s,]*')
+
+# Invalid UTF-8 bytes as decoded with 'surrogateescape'
+_ESCAPED_BYTE = re.compile('[\udc80-\udcff]')
+
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+
+def iter_object_strings(f: IO[str], block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[str]:
+    """
+    Split a text stream into top-level JSON object strings.
+
+    Args:
+        f: Text file object
+        block_size: Characters read per block
+
+    Yields:
+        Stripped JSON object strings, plus any trailing unterminated text
+    """
+    parts: List[str] = []
+    depth = 0
+    in_string = False
+    escape_next = False
+
+    while True:
+        block = f.read(block_size)
+        if not block:
+            break
+        n = len(block)
+        pos = 0
+        # Next position of each character visited inside objects (n if there
+        # is none); a position is only searched again once the scan passes it
+        next_open = next_close = next_escape = -1
+        # Start of the slice currently being collected, None while skipping
+        # text between objects
+        seg: Optional[int] = 0 if (depth > 0 or in_string or escape_next) else None
+
+        if escape_next:
+            # The escaped character was cut off by the previous block
+            escape_next = False
+            pos = 1
+            if depth <= 0 and not in_string:
+                parts.append(block[0:1])
+                seg = None
+
+        while pos < n:
+            if depth > 0:
+                if next_open < pos:
+                    next_open = block.find('{', pos) % (n + 1)
+                if next_close < pos:
+                    next_close = block.find('}', pos) % (n + 1)
+                if next_escape < pos:
+                    next_escape = block.find('\\', pos) % (n + 1)
+                i = min(next_open, next_close, next_escape)
+                # Every unescaped quote skipped over toggles the string state
+                if block.count('"', pos, i) & 1:
+                    in_string = not in_string
+                if i == n:
+                    break
+                if in_string and block[i] != '\\':
+                    # Braces inside strings are plain text
+                    pos = i + 1
+                    continue
+            else:
+                match = (_STRING_SPECIAL if in_string else _STRUCTURAL).search(block, pos)
+                if match is None:
+                    break
+                i = match.start()
+            char = block[i]
+
+            if char == '{' and not in_string and depth == 0:
+                # A new object discards whatever was collected between objects
+                parts = []
+                seg = i
+            elif seg is None:
+                seg = i
+
+            if char == '\\':
+                if i + 1 < n:
+                    pos = i + 2
+                else:
+                    escape_next = True
+                    pos = n
+            elif char == '"':
+                in_string = not in_string
+                pos = i + 1
+            elif char == '{':
+                depth += 1
+                pos = i + 1
+            else:
+                depth -= 1
+                pos = i + 1
+                if depth == 0:
+                    parts.append(block[seg:pos])
+                    yield ''.join(parts).strip()
+                    parts = []
+                    seg = None
+                    continue
+
+            if depth <= 0 and not in_string and not escape_next:
+                # Between objects only the structural characters themselves are kept
+                parts.append(block[seg:pos])
+                seg = None
+
+        if seg is not None:
+            parts.append(block[seg:])
+
+    tail = ''.join(parts).strip()
+    if tail:
+        yield tail
+
+
+def iter_object_spans(buf, start: int = 0, end: Optional[int] = None,
+                      partial: bool = True) -> Iterator[Tuple[int, int]]:
+    """
+    Locate top-level JSON objects in a bytes-like buffer without copying it.
+
+    Works on bytes or an mmap; UTF-8 continuation bytes never collide with
+    the ASCII structural characters, so no decoding is needed to scan. A str
+    can be scanned the same way, giving character offsets.
+    Boundaries match iter_object_strings(), except that text left between
+    objects is not reported.
+
+    Args:
+        buf: bytes, mmap or str
+        start: Offset to start scanning at
+        end: Offset to stop at (default: end of buffer)
+        partial: Also report an object left open at the end of the buffer
+
+    Yields:
+        (start, end) offsets of each object; an object left open at the end
+        of the buffer is reported up to the end
+    """
+    if end is None:
+        end = len(buf)
+    if isinstance(buf, str):
+        open_brace, close_brace, escape, quote = '{', '}', '\\', '"'
+    else:
+        open_brace, close_brace, escape, quote = b'{', b'}', b'\\', b'"'
+    pos = start
+    depth = 0
+    in_string = False
+    obj_start = start
+    # find() returns -1 when there is no match; -1 % (end + 1) == end
+    next_open = next_close = next_escape = -1
+
+    while True:
+        if next_open < pos:
+            next_open = buf.find(open_brace, pos, end) % (end + 1)
+        if next_close < pos:
+            next_close = buf.find(close_brace, pos, end) % (end + 1)
+        if next_escape < pos:
+            next_escape = buf.find(escape, pos, end) % (end + 1)
+        i = min(next_open, next_close, next_escape)
+        if i == end:
+            break
+        # Only the stretch since the last visited character is copied to count quotes
+        if buf[pos:i].count(quote) & 1:
+            in_string = not in_string
+        char = buf[i:i + 1]
+
+        if char == escape:
+            pos = i + 2
+            continue
+        pos = i + 1
+        if in_string:
+            continue
+        if char == open_brace:
+            if depth == 0:
+                obj_start = i
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                yield obj_start, pos
+
+    if depth > 0 and partial:
+        yield obj_start, end
+
+
+@contextmanager
+def map_file(filename: str):
+    """
+    Memory-map a file read-only.
+
+    Yields:
+        mmap object, or b'' for an empty file (which cannot be mapped)
+    """
+    with open(filename, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, 'madvise'):
+                # Read ahead aggressively; pages already scanned can be dropped
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            yield mm
+
+
+def iter_file_objects(filename: str) -> Iterator[str]:
+    """
+    Yield top-level JSON object strings from a plain or compressed file.
+
+    Uncompressed files are memory-mapped and scanned in place, so resident
+    memory stays proportional to the largest object rather than the file;
+    compressed files are decompressed and scanned block by block.
+
+    Args:
+        filename: Path to the input file
+
+    Yields:
+        JSON object strings
+    """
+    if detect_compression(filename):
+        with open_text_input(filename, background=True) as f:
+            yield from iter_object_strings(f)
+        return
+
+    with map_file(filename) as buf:
+        for start, end in iter_object_spans(buf):
+            yield buf[start:end].decode('utf-8')
+
+
+# Gap between two consecutive objects: closing brace, optional comma, opening brace
+_OBJECT_GAP = re.compile(rb'\}([ \t\r\n]*,?[ \t\r\n]*)\{')
+
+
+def _gap_indent(gap: bytes) -> Optional[bytes]:
+    """Whitespace on the opening brace's line, or None if the gap has no newline."""
+    newline = gap.rfind(b'\n')
+    return None if newline == -1 else gap[newline + 1:]
+
+
+def plan_shards(buf, count: int) -> List[int]:
+    """
+    Split a buffer into about `count` byte ranges starting at object boundaries.
+
+    Each cut is moved forward to the next gap between two objects whose
+    indentation matches the gap between the first two top-level objects,
+    which in pretty-printed dumps rules out most nested objects. The cuts are
+    only likely boundaries: a shard start is confirmed by the shard before it
+    (see iter_shard_spans) and must be rescanned if it was wrong.
+
+    Args:
+        buf: bytes or mmap object
+        count: Number of shards wanted
+
+    Returns:
+        Sorted, distinct shard start offsets, the first always 0
+    """
+    size = len(buf)
+    spans = iter_object_spans(buf)
+    first, second = next(spans, None), next(spans, None)
+    if second is None:
+        return [0]
+    indent = _gap_indent(buf[first[1]:second[0]])
+
+    starts = [0]
+    for k in range(1, count):
+        offset = max(size * k // count, starts[-1] + 1)
+        for gap in _OBJECT_GAP.finditer(buf, offset):
+            if _gap_indent(gap.group(1)) == indent:
+                starts.append(gap.end() - 1)
+                break
+        else:
+            break
+    return starts
+
+
+def iter_shard_spans(buf, start: int, limit: int, next_start: List[int]) -> Iterator[Tuple[int, int]]:
+    """
+    Yield the objects that start in [start, limit).
+
+    The scan runs past `limit` to finish the last object; the offset of the
+    first object at or beyond `limit` (or len(buf)) is stored in
+    next_start[0]. When `start` is a true object boundary and next_start[0]
+    equals the following shard's start, that start is a true boundary too.
+    """
+    next_start[0] = len(buf)
+    for span in iter_object_spans(buf, start):
+        if span[0] >= limit:
+            next_start[0] = span[0]
+            return
+        yield span
+
+
+def iter_byte_chunks(f: IO[bytes], chunk_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[bytes]:
+    """Read a binary file object in fixed-size chunks."""
+    return iter(lambda: f.read(chunk_size), b'')
+
+
+def iter_decoded_objects(chunks: Iterable[bytes], offset: int = 0, array_items: bool = False,
+                         decoder: Optional[json.JSONDecoder] = None
+                         ) -> Iterator[Tuple[int, int, Optional[Any], Optional[str]]]:
+    """
+    Decode the top-level JSON objects in a byte stream in a single pass.
+
+    Works on concatenated objects, NDJSON and arrays of objects alike: the
+    window is searched for the next '{' and raw_decode() parses the object
+    in place. An object that fails to decode although it lies entirely in
+    the window is delimited with the brace scanner and returned as text, so
+    the caller can run its repair path on just that object.
+
+    Args:
+        chunks: UTF-8 byte chunks of the input
+        offset: Byte offset of the first chunk within the file
+        array_items: Stop at the first ']' between objects (the stream starts
+            inside an array nested in a container object)
+        decoder: JSONDecoder to use (default: a plain json.JSONDecoder)
+
+    Yields:
+        (byte offset, byte length, decoded object or None, raw text if the
+        object failed to decode else None)
+    """
+    decoder = decoder or json.JSONDecoder()
+    # Invalid bytes decode to one lone surrogate each, so the text still
+    # encodes back to exactly the input bytes and offsets stay exact; the
+    # objects containing them are decoded again with U+FFFD in their place
+    utf8 = codecs.getincrementaldecoder('utf-8')('surrogateescape')
+    chunks = iter(chunks)
+    text = ''
+    escaped = False
+    pos = 0
+    eof = False
+    # Byte offset of text[mark]; advanced incrementally so multi-byte
+    # characters are only re-encoded once
+    mark = 0
+    mark_offset = offset
+
+    def byte_length(part: str) -> int:
+        return len(part) if part.isascii() else len(part.encode('utf-8', 'surrogateescape'))
+
+    while True:
+        if array_items:
+            gap_end = _ITEM_GAP.match(text, pos).end()
+            if gap_end < len(text) and text[gap_end] == ']':
+                return
+        start = text.find('{', pos)
+        if start != -1:
+            try:
+                value, end = decoder.raw_decode(text, start)
+                raw = None
+            except json.JSONDecodeError:
+                end = next((span[1] for span in iter_object_spans(text, start, partial=False)), -1)
+                if end == -1 and eof:
+                    end = len(text)
+                value = None
+                raw = text[start:end] if end != -1 else None
+
+            if end != -1:
+                mark_offset += byte_length(text[mark:start])
+                length = byte_length(text[start:end])
+                if escaped and _ESCAPED_BYTE.search(text, start, end):
+                    raw = text[start:end].encode('utf-8', 'surrogateescape').decode('utf-8', 'replace')
+                    try:
+                        value = decoder.raw_decode(raw)[0]
+                        raw = None
+                    except json.JSONDecodeError:
+                        value = None
+                yield mark_offset, length, value, raw
+                mark_offset += length
+                mark = pos = end
+                continue
+
+        if eof:
+            return
+        # Need more input: keep the unfinished object (or nothing) and read on
+        keep = start if start != -1 else len(text)
+        if array_items:
+            keep = min(keep, gap_end)
+        mark_offset += byte_length(text[mark:keep])
+        chunk = next(chunks, None)
+        eof = chunk is None
+        text = text[keep:] + utf8.decode(chunk or b'', final=eof)
+        escaped = not text.isascii() and _ESCAPED_BYTE.search(text) is not None
+        mark = pos = 0
+
+
+def iter_raw_objects(chunks: Iterable[bytes], offset: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """
+    Split a byte stream into top-level JSON objects without decoding them.
+
+    The brace scanner of iter_object_spans runs over the raw bytes, so
+    objects can be handed to other processes to decode. Its state (depth,
+    inside a string, an escape cut off at the end of a chunk) is carried
+    from one chunk to the next, so each byte is scanned once and only the
+    object still open is kept. Text between objects is dropped; an object
+    left open at the end of the stream is returned as it is.
+
+    Args:
+        chunks: UTF-8 byte chunks of the input
+        offset: Byte offset of the first chunk within the file
+
+    Yields:
+        (byte offset, object bytes)
+    """
+    buf = bytearray()
+    pos = 0
+    depth = 0
+    in_string = False
+    obj_start = 0
+    for chunk in chunks:
+        buf += chunk
+        end = len(buf)
+        next_open = next_close = next_escape = -1
+        while pos < end:
+            if next_open < pos:
+                next_open = buf.find(b'{', pos, end) % (end + 1)
+            if next_close < pos:
+                next_close = buf.find(b'}', pos, end) % (end + 1)
+            if next_escape < pos:
+                next_escape = buf.find(b'\\', pos, end) % (end + 1)
+            i = min(next_open, next_close, next_escape)
+            if buf.count(b'"', pos, i) & 1:
+                in_string = not in_string
+            if i == end:
+                pos = end
+                break
+            char = buf[i]
+
+            if char == 0x5c:
+                # May skip past the end; the escaped byte opens the next chunk
+                pos = i + 2
+                continue
+            pos = i + 1
+            if in_string:
+                continue
+            if char == 0x7b:
+                if depth == 0:
+                    obj_start = i
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    yield offset + obj_start, bytes(buf[obj_start:pos])
+
+        # Keep only the object still open
+        keep = obj_start if depth > 0 else min(pos, end)
+        del buf[:keep]
+        offset += keep
+        pos -= keep
+        obj_start -= keep
+    if depth > 0:
+        yield offset + obj_start, bytes(buf[obj_start:])
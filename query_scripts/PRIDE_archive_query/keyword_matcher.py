@@ -0,0 +1,107 @@
+"""
+Multi-term substring matching for the TSV filters.
+
+A KeywordMatcher is built once per term list and reports which of the terms
+occur in a text. With the optional `pyahocorasick` package the terms are
+compiled into an Aho-Corasick automaton, so one pass over the text finds
+every term and the cost per row does not depend on the number of terms.
+
+Without it, long lists are compiled into a single regex whose alternation is
+laid out as a trie (terms sharing a prefix share a branch), which also scans
+the text once but pays the regex engine's cost per character; below about
+REGEX_MIN_TERMS terms that is slower than testing `term in text` for each
+term at C speed, so short lists keep doing that.
+
+Matching is on plain substrings, like the `term in text` checks it
+replaces. Terms are lowercased when the matcher is built; the text passed in
+must already be lowercase.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, Set
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Term count from which the trie regex beats one substring test per term
+# (measured on PRIDE-like descriptions)
+REGEX_MIN_TERMS = 90
+
+
+def _trie_pattern(node: Dict[str, dict]) -> str:
+    """Regex for the terms below a trie node; '' marks the end of a term."""
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        # Greedy, so the longest term starting at a position wins
+        if len(branches) == 1 and len(branches[0]) > 1:
+            pattern = '(?:' + pattern + ')'
+        pattern += '?'
+    return pattern
+
+
+class KeywordMatcher:
+    """Finds which of a fixed list of terms occur in a text."""
+
+    def __init__(self, terms: Iterable[str]):
+        self.terms = list(dict.fromkeys(term.lower() for term in terms if term))
+        self.automaton = None
+        self.pattern = None
+        if not self.terms:
+            return
+
+        if ahocorasick is not None:
+            self.automaton = ahocorasick.Automaton()
+            for term in self.terms:
+                self.automaton.add_word(term, term)
+            self.automaton.make_automaton()
+        elif len(self.terms) >= REGEX_MIN_TERMS:
+            trie: Dict[str, dict] = {}
+            for term in self.terms:
+                node = trie
+                for char in term:
+                    node = node.setdefault(char, {})
+                node[''] = {}
+            self.pattern = re.compile(_trie_pattern(trie))
+            # The regex reports the longest term starting at each position;
+            # the terms contained in it occur in the text as well
+            self.implied: Dict[str, FrozenSet[str]] = {
+                term: frozenset(other for other in self.terms if other in term) for term in self.terms
+            }
+
+    def matches(self, text: str) -> bool:
+        """True if any term occurs in a lowercase text."""
+        if self.automaton is not None:
+            return next(self.automaton.iter(text), None) is not None
+        if self.pattern is not None:
+            return self.pattern.search(text) is not None
+        return any(term in text for term in self.terms)
+
+    def find_all(self, text: str) -> Set[str]:
+        """
+        Find every term that occurs in a lowercase text.
+
+        Returns:
+            Set of matched terms (overlapping and nested terms included)
+        """
+        if self.automaton is not None:
+            return {term for _, term in self.automaton.iter(text)}
+        if self.pattern is None:
+            return {term for term in self.terms if term in text}
+
+        found: Set[str] = set()
+        search = self.pattern.search
+        implied = self.implied
+        match = search(text)
+        while match is not None:
+            found |= implied[match.group()]
+            # Resume one character on, so terms overlapping this one are found too
+            match = search(text, match.start() + 1)
+        return found
+
+    def __len__(self) -> int:
+        return len(self.terms)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Accession index for random access into large PRIDE dumps.
+
+Maps each project accession to the byte offset and length of its object in
+the dump, so a project can be read with one seek instead of a full scan.
+The index is written next to the dump (<dump>.index.json) either by a
+conversion run with --index (updated_json_parser.py) or by the `build`
+command below, and remembers the dump's size and modification time so a
+stale index is refused rather than silently returning the wrong bytes.
+
+Examples:
+    python object_index.py build pride_datasets.json
+    python object_index.py get pride_datasets.json PXD012345 PXD023456
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from compressed_input import open_binary_input
+from json_stream import iter_byte_chunks, iter_decoded_objects
+
+INDEX_SUFFIX = '.index.json'
+# Accession of an object that failed to decode, read from its raw text
+ACCESSION_PATTERN = re.compile(r'"accession"\s*:\s*"([^"\\]+)"')
+
+
+def index_filename(filename: str) -> str:
+    """Default index path for a dump."""
+    return filename + INDEX_SUFFIX
+
+
+class ObjectIndex:
+    """Accession -> (byte offset, byte length) of the project object in one dump."""
+
+    def __init__(self, source: str, entries: Optional[Dict[str, Tuple[int, int]]] = None):
+        self.source = source
+        self.entries: Dict[str, Tuple[int, int]] = entries or {}
+        self.duplicates = 0
+
+    def add(self, accession: Optional[str], offset: int, length: int) -> None:
+        """Record an object; the first occurrence of an accession wins."""
+        if not accession:
+            return
+        if accession in self.entries:
+            self.duplicates += 1
+            return
+        self.entries[accession] = (offset, length)
+
+    def update(self, entries: Iterable[Tuple[str, int, int]]) -> None:
+        for accession, offset, length in entries:
+            self.add(accession, offset, length)
+
+    def save(self, path: Optional[str] = None) -> str:
+        """Write the index atomically; returns its path."""
+        path = path or index_filename(self.source)
+        stat = os.stat(self.source)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'source': os.path.basename(self.source), 'size': stat.st_size,
+                       'mtime': stat.st_mtime, 'objects': self.entries}, f)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, source: str, path: Optional[str] = None) -> 'ObjectIndex':
+        """
+        Load the index of a dump.
+
+        Raises:
+            FileNotFoundError: No index has been built
+            ValueError: The dump changed since the index was built
+        """
+        path = path or index_filename(source)
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        stat = os.stat(source)
+        if data['size'] != stat.st_size or data['mtime'] != stat.st_mtime:
+            raise ValueError(f"Index {path} is out of date for {source}; rebuild it")
+        return cls(source, {accession: tuple(span) for accession, span in data['objects'].items()})
+
+    def lookup(self, accessions: Iterable[str]) -> Iterator[Tuple[str, Optional[bytes]]]:
+        """
+        Read the raw objects of some accessions with one seek each.
+
+        Yields:
+            (accession, object bytes or None if the accession is not indexed)
+        """
+        with open_binary_input(self.source) as f:
+            for accession in accessions:
+                span = self.entries.get(accession)
+                if span is None:
+                    yield accession, None
+                    continue
+                f.seek(span[0])
+                yield accession, f.read(span[1])
+
+    def get(self, accession: str) -> Optional[dict]:
+        """
+        Decode one project, or None if it is not in the index.
+
+        Raises:
+            ValueError: The indexed object is malformed beyond repair
+        """
+        raw = next(self.lookup([accession]))[1]
+        if raw is None:
+            return None
+        obj = decode_object(raw)
+        if obj is None:
+            raise ValueError(f"{accession}: indexed object could not be decoded")
+        return obj
+
+
+def decode_object(raw: bytes) -> Optional[dict]:
+    """
+    Decode an indexed object, running it through the converter's repairs if needed.
+
+    build_index also indexes objects that failed to decode (by the
+    accession in their text), so a lookup can return malformed JSON.
+
+    Returns:
+        The project, or None if the repairs fail as well
+    """
+    text = raw.decode('utf-8', 'replace')
+    try:
+        obj = json.loads(text)
+    except json.JSONDecodeError:
+        # Imported here: updated_json_parser imports this module
+        from updated_json_parser import StreamingJSONParser
+        return StreamingJSONParser().repair_json_object(text)
+    return obj if isinstance(obj, dict) else None
+
+
+def build_index(filename: str) -> ObjectIndex:
+    """Scan a dump once and index every object by accession."""
+    index = ObjectIndex(filename)
+    with open_binary_input(filename, background=True) as f:
+        for offset, length, obj, raw in iter_decoded_objects(iter_byte_chunks(f)):
+            if obj is not None:
+                accession = obj.get('accession')
+            else:
+                match = ACCESSION_PATTERN.search(raw)
+                accession = match.group(1) if match else None
+            index.add(accession, offset, length)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index a PRIDE dump by accession and look projects up.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="Scan the dump and write its index")
+    build.add_argument('dump', help="PRIDE JSON dump (plain or compressed)")
+    get = commands.add_parser('get', help="Print projects by accession using the index")
+    get.add_argument('dump', help="PRIDE JSON dump the index was built from")
+    get.add_argument('accessions', nargs='+')
+    for command in (build, get):
+        command.add_argument('--index', help="Index path (default: <dump>.index.json)")
+    args = parser.parse_args()
+
+    started = time.time()
+    if args.command == 'build':
+        index = build_index(args.dump)
+        path = index.save(args.index)
+        print(f"Indexed {len(index.entries)} projects in {time.time() - started:.1f}s -> {path}")
+        if index.duplicates:
+            print(f"Warning: {index.duplicates} duplicate accessions kept at their first occurrence")
+        return
+
+    try:
+        index = ObjectIndex.load(args.dump, args.index)
+    except FileNotFoundError:
+        print(f"Error: no index for {args.dump}; run: python object_index.py build {args.dump}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    missing = 0
+    for accession, raw in index.lookup(args.accessions):
+        if raw is None:
+            print(f"{accession}: not in index", file=sys.stderr)
+            missing += 1
+            continue
+        obj = decode_object(raw)
+        if obj is None:
+            print(f"Warning: {accession} is malformed JSON that could not be repaired; raw object follows",
+                  file=sys.stderr)
+            print(raw.decode('utf-8', 'replace'))
+            continue
+        print(json.dumps(obj, indent=2, ensure_ascii=False))
+    print(f"Looked up {len(args.accessions)} accessions in {(time.time() - started) * 1000:.1f} ms",
+          file=sys.stderr)
+    if missing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
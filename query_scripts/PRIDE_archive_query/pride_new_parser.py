@@ -2,17 +2,27 @@
 """
 PRIDE Archive Dataset Filter
 Filters datasets for Immunopeptidomics + Cancer + timsTOF criteria
+
+The criteria are the 'immunopeptidomics-cancer-timstof' spec of the shared
+filter engine (filter_engine.py); --filter-spec runs any other spec instead.
 """
 
+import argparse
 import json
 import csv
+import itertools
 import re
-from typing import List, Dict, Any
+import sys
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+from compressed_input import open_binary_input, open_text_input
+from filter_engine import BUILTIN_SPECS, load_filter
+from json_stream import iter_byte_chunks, iter_decoded_objects
 
 def detect_file_format(filename: str) -> str:
     """Detect the file format (JSON, CSV, TSV, etc.)."""
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
+        with open_text_input(filename) as f:
             first_line = f.readline().strip()
             second_line = f.readline().strip()
             third_line = f.readline().strip()
@@ -40,8 +50,8 @@ def detect_file_format(filename: str) -> str:
         print(f"Error detecting format: {e}")
         return 'unknown'
 
-def load_pride_data(filename: str) -> List[Dict[str, Any]]:
-    """Load PRIDE datasets from various file formats."""
+def load_pride_data(filename: str) -> Iterable[Dict[str, Any]]:
+    """Load PRIDE datasets from various file formats (JSON is streamed)."""
     file_format = detect_file_format(filename)
     print(f"Detected file format: {file_format}")
     
@@ -52,7 +62,7 @@ def load_pride_data(filename: str) -> List[Dict[str, Any]]:
     else:
         print("Unknown file format. Showing first few lines:")
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
+            with open_text_input(filename) as f:
                 for i, line in enumerate(f):
                     if i >= 10:  # Show first 10 lines
                         break
@@ -67,7 +77,7 @@ def load_pride_csv(filename: str, file_format: str) -> List[Dict[str, Any]]:
     delimiter = '\t' if file_format == 'tsv' else ','
     
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
+        with open_text_input(filename, background=True) as f:
             reader = csv.DictReader(f, delimiter=delimiter)
             
             print(f"CSV/TSV columns found: {reader.fieldnames}")
@@ -110,196 +120,73 @@ def load_pride_csv(filename: str, file_format: str) -> List[Dict[str, Any]]:
         print(f"Error loading {file_format.upper()} file: {e}")
         return []
 
-def load_pride_json(filename: str) -> List[Dict[str, Any]]:
-    """Load the PRIDE datasets JSON file, handling multiple formats."""
-    datasets = []
-    
+# Top-level keys under which a JSON dump may wrap its list of datasets
+CONTAINER_KEYS = ('datasets', 'projects', 'data')
+CONTAINER_START = re.compile(rb'\s*\{\s*"(datasets|projects|data)"\s*:\s*\[')
+# Bytes read to look for a container key at the start of the file
+CONTAINER_PEEK = 4096
+
+def iter_json_objects(filename: str) -> Iterator[Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Decode the JSON objects in a file one at a time, in a single pass.
+
+    When the datasets are wrapped in a container object ({"datasets": [...]})
+    decoding starts inside the list, so each dataset is still decoded on its
+    own.
+
+    Yields:
+        (decoded object, None), or (None, raw text) for an object that failed
+        to decode
+    """
+    with open_binary_input(filename, background=True) as f:
+        head = f.read(CONTAINER_PEEK)
+        container = CONTAINER_START.match(head)
+        start = 0
+        if container:
+            print(f"Found '{container.group(1).decode()}' key, streaming its items")
+            start = container.end()
+        chunks = itertools.chain([head[start:]], iter_byte_chunks(f))
+        for _offset, _length, obj, raw in iter_decoded_objects(chunks, start, array_items=bool(container)):
+            yield obj, raw
+
+def parse_dataset(obj_str: str, index: int) -> Optional[Dict[str, Any]]:
+    """Parse an object that failed to decode, retrying without trailing commas."""
+    # Remove trailing commas before closing braces/brackets
+    fixed = re.sub(r',(\s*[}\]])', r'\1', obj_str)
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-        
-        # First, try to load as standard JSON
-        try:
-            data = json.loads(content)
-            print(f"Successfully loaded JSON. Type: {type(data)}")
-            
-            # Handle different JSON structures
-            if isinstance(data, list):
-                print(f"Found JSON array with {len(data)} items")
-                return data
-            elif isinstance(data, dict):
-                print(f"Found JSON object with keys: {list(data.keys())}")
-                
-                # Check for common dataset container keys
-                if 'datasets' in data:
-                    print(f"Found 'datasets' key with {len(data['datasets'])} items")
-                    return data['datasets']
-                elif 'projects' in data:
-                    print(f"Found 'projects' key with {len(data['projects'])} items")
-                    return data['projects']
-                elif 'data' in data:
-                    print(f"Found 'data' key with {len(data['data'])} items")
-                    return data['data']
-                else:
-                    # If it's a single dataset object, wrap in list
-                    print("Treating as single dataset object")
-                    return [data]
-            else:
-                print(f"Unexpected JSON type: {type(data)}")
-                return []
-        
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing failed: {e}")
-            
-            # Check if this is concatenated JSON objects (multiple objects separated by }\n{)
-            if "Extra data:" in str(e):
-                print("Detected concatenated JSON objects. Attempting to split and parse...")
-                
-                # Split on }\n{ pattern but preserve the braces
-                json_objects = []
-                current_obj = ""
-                brace_count = 0
-                in_string = False
-                escape_next = False
-                
-                for char in content:
-                    current_obj += char
-                    
-                    if escape_next:
-                        escape_next = False
-                        continue
-                    
-                    if char == '\\':
-                        escape_next = True
-                        continue
-                    
-                    if char == '"' and not escape_next:
-                        in_string = not in_string
-                        continue
-                    
-                    if not in_string:
-                        if char == '{':
-                            brace_count += 1
-                        elif char == '}':
-                            brace_count -= 1
-                            
-                            if brace_count == 0:
-                                # We've found a complete JSON object
-                                json_objects.append(current_obj.strip())
-                                current_obj = ""
-                
-                print(f"Found {len(json_objects)} JSON objects")
-                
-                # Parse each JSON object
-                for i, obj_str in enumerate(json_objects):
-                    if obj_str:
-                        try:
-                            dataset = json.loads(obj_str)
-                            datasets.append(dataset)
-                        except json.JSONDecodeError as obj_error:
-                            print(f"Warning: Failed to parse JSON object {i+1}: {obj_error}")
-                            continue
-                
-                if datasets:
-                    print(f"Successfully loaded {len(datasets)} datasets from concatenated JSON format.")
-                    return datasets
-            
-            # Try to fix common JSON issues as fallback
-            print("Attempting to fix common JSON formatting issues...")
-            
-            # Remove trailing commas before closing braces/brackets
-            fixed_content = re.sub(r',(\s*[}\]])', r'\1', content)
-            
-            # Try parsing the fixed content
-            try:
-                data = json.loads(fixed_content)
-                print("Successfully fixed and loaded JSON!")
-                
-                if isinstance(data, list):
-                    return data
-                elif isinstance(data, dict):
-                    if 'datasets' in data:
-                        return data['datasets']
-                    elif 'projects' in data:
-                        return data['projects']
-                    else:
-                        return [data]
-            except json.JSONDecodeError as e2:
-                print(f"Fixed JSON parsing also failed: {e2}")
-                return []
-    
+        return json.loads(fixed)
+    except json.JSONDecodeError as e:
+        print(f"Warning: Failed to parse JSON object {index}: {e}")
+        return None
+
+def load_pride_json(filename: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the PRIDE datasets from a JSON file, handling multiple formats.
+
+    Accepts a JSON array, concatenated objects, one object per line, or a
+    container object holding the list under one of CONTAINER_KEYS. Only one
+    dataset is decoded at a time.
+    """
+    try:
+        count = 0
+        for index, (data, raw) in enumerate(iter_json_objects(filename), 1):
+            if raw is not None:
+                data = parse_dataset(raw, index)
+            if not isinstance(data, dict):
+                continue
+            # A container that could not be unwrapped in place (list not under the first key)
+            items = next((data[key] for key in CONTAINER_KEYS
+                          if 'accession' not in data and isinstance(data.get(key), list)), None)
+            for dataset in items if items is not None else [data]:
+                count += 1
+                yield dataset
+        print(f"Streamed {count} datasets from JSON file.")
+
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found.")
-        return []
     except Exception as e:
         print(f"Unexpected error reading file '{filename}': {e}")
-        return []
-    
-    return []
-
-def check_immunopeptidomics(dataset: Dict[str, Any]) -> bool:
-    """Check if dataset is related to immunopeptidomics."""
-    search_fields = [
-        'title', 'projectDescription', 'keywords', 'projectTags'
-    ]
-    
-    immunopep_terms = [
-        'immunopeptidomics', 'immunopeptidome', 'immunopeptides',
-        'mhc', 'hla', 'antigen presentation', 'peptide presentation',
-        'major histocompatibility', 'immunopeptide'
-    ]
-    
-    for field in search_fields:
-        if field in dataset and dataset[field]:
-            text = str(dataset[field]).lower()
-            for term in immunopep_terms:
-                if term in text:
-                    return True
-    return False
-
-def check_cancer(dataset: Dict[str, Any]) -> bool:
-    """Check if dataset is related to cancer."""
-    search_fields = [
-        'title', 'projectDescription', 'keywords', 'projectTags'
-    ]
-    
-    cancer_terms = [
-        'cancer', 'tumor', 'tumour', 'carcinoma', 'melanoma',
-        'leukemia', 'lymphoma', 'oncology', 'neoplasm', 'malignant',
-        'metastasis', 'adenocarcinoma', 'sarcoma', 'glioma'
-    ]
-    
-    for field in search_fields:
-        if field in dataset and dataset[field]:
-            text = str(dataset[field]).lower()
-            for term in cancer_terms:
-                if term in text:
-                    return True
-    return False
 
-def check_timstof(dataset: Dict[str, Any]) -> bool:
-    """Check if dataset used timsTOF instruments."""
-    # Check in instruments field
-    if 'instruments' in dataset and dataset['instruments']:
-        for instrument in dataset['instruments']:
-            if isinstance(instrument, dict):
-                # Check various possible fields in instrument object
-                instrument_text = str(instrument).lower()
-                if 'timstof' in instrument_text or 'tims-tof' in instrument_text:
-                    return True
-            elif isinstance(instrument, str):
-                if 'timstof' in instrument.lower() or 'tims-tof' in instrument.lower():
-                    return True
-    
-    # Also check in title and description as fallback
-    search_fields = ['title', 'projectDescription']
-    for field in search_fields:
-        if field in dataset and dataset[field]:
-            text = str(dataset[field]).lower()
-            if 'timstof' in text or 'tims-tof' in text:
-                return True
-    
-    return False
 
 def extract_dataset_info(dataset: Dict[str, Any]) -> Dict[str, str]:
     """Extract relevant information from a dataset."""
@@ -316,32 +203,47 @@ def extract_dataset_info(dataset: Dict[str, Any]) -> Dict[str, str]:
                           for s in dataset.get('submitters', []) if isinstance(s, dict)])
     }
 
+DEFAULT_SPEC = 'immunopeptidomics-cancer-timstof'
+
 def main():
     """Main function to process PRIDE datasets."""
-    input_file = 'pride_datasets.json'
+    arg_parser = argparse.ArgumentParser(description="Filter a PRIDE dump for Immunopeptidomics + Cancer + timsTOF.")
+    # Plain or gzip/bz2/xz/zstd-compressed dump (e.g. a pride_snapshot.py snapshot)
+    arg_parser.add_argument('input_file', nargs='?', default='pride_datasets.json',
+                            help="PRIDE JSON/CSV/TSV file, plain or compressed (default: pride_datasets.json)")
+    arg_parser.add_argument('--filter-spec', default=DEFAULT_SPEC,
+                            help=f"Built-in filter spec ({', '.join(BUILTIN_SPECS)}) or JSON spec file "
+                                 f"(see filter_engine.py; default: {DEFAULT_SPEC})")
+    args = arg_parser.parse_args()
+    input_file = args.input_file
     output_file = 'pride_ip_datasets.tsv'
+
+    try:
+        dataset_filter = load_filter(args.filter_spec)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
     
     print(f"Loading datasets from {input_file}...")
     datasets = load_pride_data(input_file)
     
-    if not datasets:
-        print("No datasets found or error loading file.")
-        return
-    
-    print(f"Loaded {len(datasets)} datasets.")
-    print("Filtering for Immunopeptidomics + Cancer + timsTOF criteria...")
+    # JSON input is filtered as it streams in, so only the matches are kept
+    print(f"Filtering with {dataset_filter.describe()}")
     
     matching_datasets = []
+    total_datasets = 0
     
     for dataset in datasets:
-        is_immunopep = check_immunopeptidomics(dataset)
-        is_cancer = check_cancer(dataset)
-        is_timstof = check_timstof(dataset)
-        
-        if is_immunopep and is_cancer and is_timstof:
+        total_datasets += 1
+        if dataset_filter.matches(dataset):
             matching_datasets.append(extract_dataset_info(dataset))
             print(f"✓ Found match: {dataset.get('accession', 'Unknown')} - {dataset.get('title', 'No title')[:80]}...")
     
+    if not total_datasets:
+        print("No datasets found or error loading file.")
+        return
+    
+    print(f"Loaded {total_datasets} datasets.")
     print(f"\nFound {len(matching_datasets)} datasets matching all criteria.")
     
     if matching_datasets:
@@ -363,7 +265,7 @@ def main():
         
         # Print summary
         print(f"\nSummary:")
-        print(f"- Total datasets processed: {len(datasets)}")
+        print(f"- Total datasets processed: {total_datasets}")
         print(f"- Matching datasets found: {len(matching_datasets)}")
         print(f"- Output saved to: {output_file}")
         
@@ -6,11 +6,47 @@ This script uses a streaming approach to parse large JSON files
 that may have formatting issues with multi-line text fields.
 """
 
+import argparse
 import json
+import os
+import queue
 import re
 import csv
+import shutil
 import sys
-from typing import List, Dict, Any, Optional, Iterator
+import tempfile
+import threading
+import time
+from collections import deque
+from multiprocessing import Pool
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+from compressed_input import detect_compression, open_binary_input, strip_compression_suffix
+from json_stream import (iter_byte_chunks, iter_decoded_objects, iter_file_objects, iter_raw_objects,
+                         iter_shard_spans, map_file, plan_shards)
+from object_index import ObjectIndex
+
+# Repair tiers tried in order by parse_json_object, with their report labels
+PARSE_TIERS = {
+    'plain': "Parsed as-is",
+    'cleaned': "Parsed after clean_json_string",
+    'fixed': "Parsed after fix_json_object",
+    'failed': "Could not be parsed",
+}
+
+# Columns of the quarantine sidecar listing the objects that could not be parsed
+QUARANTINE_COLUMNS = ['offset', 'length', 'error']
+
+# Shards per worker; smaller shards even out the load between workers
+SHARDS_PER_WORKER = 4
+
+# Pipelined conversion: raw bytes per batch handed to a worker, batches the
+# reader may queue ahead, batches in flight per worker and parsed batches
+# waiting for the writer
+PIPELINE_BATCH_BYTES = 1 << 20
+PIPELINE_READ_AHEAD = 8
+PIPELINE_IN_FLIGHT_PER_WORKER = 2
+PIPELINE_WRITE_BEHIND = 8
 
 class StreamingJSONParser:
     """Class to handle streaming parsing of very large JSON files."""
@@ -41,68 +77,65 @@ class StreamingJSONParser:
             'submitters'
         ]
 
+        # Objects parsed by each repair tier (see PARSE_TIERS)
+        self.parse_stats = dict.fromkeys(PARSE_TIERS, 0)
+        # Why the last object handed to parse_json_object could not be parsed
+        self.last_error: Optional[str] = None
+
     def find_json_objects_streaming(self, filename: str) -> Iterator[str]:
         """
         Find JSON objects in the file using a streaming approach.
+
+        Plain files are memory-mapped and scanned in place, compressed ones
+        in large blocks (see json_stream.py); either way only the object
+        being yielded is held in memory.
         
         Args:
-            filename: Path to the JSON file
+            filename: Path to the JSON file (plain or gzip/bz2/xz/zstd-compressed)
             
         Yields:
             JSON object strings
         """
         print(f"Streaming through JSON file: {filename}")
         
-        with open(filename, 'r', encoding='utf-8') as f:
-            buffer = ""
-            brace_count = 0
-            in_string = False
-            escape_next = False
-            
-            for line in f:
-                for char in line:
-                    if escape_next:
-                        escape_next = False
-                        buffer += char
-                        continue
-                    
-                    if char == '\\':
-                        escape_next = True
-                        buffer += char
-                        continue
-                    
-                    if char == '"' and not escape_next:
-                        in_string = not in_string
-                        buffer += char
-                        continue
-                    
-                    if not in_string:
-                        if char == '{':
-                            if brace_count == 0:
-                                buffer = char
-                            else:
-                                buffer += char
-                            brace_count += 1
-                        elif char == '}':
-                            buffer += char
-                            brace_count -= 1
-                            if brace_count == 0:
-                                # Complete JSON object found
-                                yield buffer.strip()
-                                buffer = ""
-                        else:
-                            if brace_count > 0:
-                                buffer += char
-                    else:
-                        buffer += char
+        yield from iter_file_objects(filename)
+
+    def decode_objects_streaming(self, filename: str) -> Iterator[Tuple[int, int, Optional[Dict[str, Any]]]]:
+        """
+        Decode the JSON objects in the file in a single pass.
+
+        Objects are parsed straight from the read buffer with raw_decode
+        (see json_stream.iter_decoded_objects); only objects that fail to
+        decode go through parse_json_object and its repairs.
+
+        Whole objects are decoded even though only output_columns are used:
+        walking the keys in Python to skip unwanted values measured 2-3x
+        slower than the C decoder, even on objects where most of the bytes
+        are protocol text and nested CV params.
+        
+        Args:
+            filename: Path to the JSON file (plain or gzip/bz2/xz/zstd-compressed)
             
-            # Handle any remaining buffer
-            if buffer.strip():
-                yield buffer.strip()
+        Yields:
+            (byte offset, byte length, parsed dictionary or None if the object
+            could not be parsed)
+        """
+        print(f"Streaming through JSON file: {filename}")
+        
+        with open_binary_input(filename, background=True) as f:
+            for offset, length, obj, raw in iter_decoded_objects(iter_byte_chunks(f)):
+                if raw is None:
+                    self.parse_stats['plain'] += 1
+                    yield offset, length, obj
+                else:
+                    yield offset, length, self.repair_json_object(raw)
 
     def parse_json_object(self, json_str: str) -> Optional[Dict[str, Any]]:
         """
         Parse a single JSON object string.
+
+        Almost every object in a PRIDE dump is valid JSON, so a plain decode
+        is tried first; the regex repairs only run on objects that fail it.
         
         Args:
             json_str: JSON object string
@@ -110,6 +143,33 @@ class StreamingJSONParser:
         Returns:
             Parsed dictionary or None if parsing fails
         """
+        try:
+            obj = json.loads(json_str)
+        except json.JSONDecodeError:
+            return self.repair_json_object(json_str)
+        
+        if isinstance(obj, dict):
+            self.parse_stats['plain'] += 1
+            return obj
+        self.parse_stats['failed'] += 1
+        self.last_error = f"Top-level value is a {type(obj).__name__}, not an object"
+        return None
+
+    def repair_json_object(self, json_str: str) -> Optional[Dict[str, Any]]:
+        """
+        Parse an object that failed to decode as-is.
+
+        Tries clean_json_string, then the fix_json_object heuristics, and
+        counts which repair tier succeeded in parse_stats. On failure the
+        decode error is kept in last_error.
+        
+        Args:
+            json_str: JSON object string
+            
+        Returns:
+            Parsed dictionary or None if parsing fails
+        """
+        self.last_error = "Repaired value is not an object"
         try:
             # Clean the JSON string
             cleaned = self.clean_json_string(json_str)
@@ -117,6 +177,7 @@ class StreamingJSONParser:
             # Try to parse
             obj = json.loads(cleaned)
             if isinstance(obj, dict):
+                self.parse_stats['cleaned'] += 1
                 return obj
         except json.JSONDecodeError:
             # Try to fix common issues
@@ -124,12 +185,20 @@ class StreamingJSONParser:
                 fixed = self.fix_json_object(json_str)
                 obj = json.loads(fixed)
                 if isinstance(obj, dict):
+                    self.parse_stats['fixed'] += 1
                     return obj
-            except json.JSONDecodeError:
-                pass
+            except json.JSONDecodeError as e:
+                self.last_error = str(e)
         
+        self.parse_stats['failed'] += 1
         return None
 
+    def report_parse_stats(self) -> None:
+        """Print how many objects needed each repair tier."""
+        print("Repair tiers:")
+        for tier, description in PARSE_TIERS.items():
+            print(f"  {description}: {self.parse_stats[tier]}")
+
     def clean_json_string(self, json_str: str) -> str:
         """
         Clean up JSON string.
@@ -269,13 +338,18 @@ class StreamingJSONParser:
         else:
             return str(value)
 
-    def convert_to_tsv(self, input_filename: str, output_filename: str) -> bool:
+    def dataset_to_row(self, dataset: Dict[str, Any]) -> List[str]:
+        """Extract the value of each output column from a dataset."""
+        return [self.extract_field_value(dataset, column) for column in self.output_columns]
+
+    def convert_to_tsv(self, input_filename: str, output_filename: str, build_index: bool = False) -> bool:
         """
         Convert JSON file to TSV format using streaming parsing.
         
         Args:
             input_filename: Input JSON file
             output_filename: Output TSV file
+            build_index: Also write the accession index of the input (see object_index.py)
             
         Returns:
             True if successful, False otherwise
@@ -284,61 +358,512 @@ class StreamingJSONParser:
             print(f"Converting {input_filename} to {output_filename}")
             print("=" * 50)
             
-            with open(output_filename, 'w', newline='', encoding='utf-8') as tsvfile:
+            quarantine_path = quarantine_filename(output_filename)
+            with open(output_filename, 'w', newline='', encoding='utf-8') as tsvfile, \
+                    open(quarantine_path, 'w', newline='', encoding='utf-8') as quarantine:
                 writer = csv.writer(tsvfile, delimiter='\t')
+                quarantine_writer = csv.writer(quarantine, delimiter='\t')
                 
                 # Write header
                 writer.writerow(self.output_columns)
+                quarantine_writer.writerow(QUARANTINE_COLUMNS)
                 
                 # Process datasets
                 processed_count = 0
                 valid_count = 0
+                index = ObjectIndex(input_filename) if build_index else None
                 
-                for json_obj_str in self.find_json_objects_streaming(input_filename):
+                for offset, length, dataset in self.decode_objects_streaming(input_filename):
                     processed_count += 1
                     
                     if processed_count % 1000 == 0:
                         print(f"Found {processed_count} objects, parsed {valid_count} successfully...")
                     
-                    # Parse the JSON object
-                    dataset = self.parse_json_object(json_obj_str)
                     if dataset:
                         valid_count += 1
-                        
-                        # Extract values for each column
-                        row = []
-                        for column in self.output_columns:
-                            value = self.extract_field_value(dataset, column)
-                            row.append(value)
-                        
+                        row = self.dataset_to_row(dataset)
                         writer.writerow(row)
+                        if index is not None:
+                            index.add(row[0], offset, length)
+                    else:
+                        quarantine_writer.writerow([offset, length, self.last_error])
                 
-                print(f"Processing complete!")
-                print(f"Total objects found: {processed_count}")
-                print(f"Successfully parsed: {valid_count}")
-                print(f"Successfully converted {valid_count} datasets to {output_filename}")
-                return True
+            print(f"Processing complete!")
+            print(f"Total objects found: {processed_count}")
+            print(f"Successfully parsed: {valid_count}")
+            self.report_parse_stats()
+            report_quarantine(quarantine_path, processed_count - valid_count)
+            if index is not None:
+                print(f"Indexed {len(index.entries)} accessions in {index.save()}")
+            print(f"Successfully converted {valid_count} datasets to {output_filename}")
+            return True
                 
         except Exception as e:
             print(f"Error converting to TSV: {e}")
             return False
 
+    def convert_to_tsv_parallel(self, input_filename: str, output_filename: str, workers: int,
+                                build_index: bool = False) -> bool:
+        """
+        Convert JSON file to TSV format with several worker processes.
+
+        The memory-mapped input is cut into byte ranges at likely object
+        boundaries; each worker parses and formats the objects starting in
+        its ranges into a part file, and the parts are concatenated in order.
+        A range whose start turns out not to be an object boundary (checked
+        against where the previous range's scan ended) is redone here.
+
+        Args:
+            input_filename: Input JSON file (compressed input goes through convert_to_tsv_pipelined)
+            output_filename: Output TSV file
+            workers: Number of worker processes
+            build_index: Also write the accession index of the input (see object_index.py)
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if detect_compression(input_filename):
+            print("Compressed input cannot be split by byte range; converting with a pipeline instead")
+            return self.convert_to_tsv_pipelined(input_filename, output_filename, workers, build_index)
+
+        try:
+            print(f"Converting {input_filename} to {output_filename} with {workers} workers")
+            print("=" * 50)
+
+            with map_file(input_filename) as buf:
+                starts = plan_shards(buf, workers * SHARDS_PER_WORKER)
+                limits = starts[1:] + [len(buf)]
+            print(f"Split input into {len(starts)} shards")
+
+            part_dir = tempfile.mkdtemp(prefix='.tsv_parts_', dir=os.path.dirname(os.path.abspath(output_filename)))
+            try:
+                tasks = [(input_filename, start, limit, os.path.join(part_dir, f"part_{i:05d}.tsv"))
+                         for i, (start, limit) in enumerate(zip(starts, limits))]
+                with Pool(workers) as pool:
+                    results = pool.map(convert_shard, tasks)
+
+                processed_count = 0
+                valid_count = 0
+                index = ObjectIndex(input_filename) if build_index else None
+                # The first shard starts at 0; every later start must be where
+                # the previous shard's scan found its next object
+                expected_start = 0
+                for i, task in enumerate(tasks):
+                    if task[1] != expected_start:
+                        print(f"Shard {i} did not start on an object boundary; rescanning from byte {expected_start}")
+                        task = (input_filename, expected_start) + task[2:]
+                        results[i] = convert_shard(task)
+                    processed, valid, expected_start, parse_stats, index_entries = results[i]
+                    processed_count += processed
+                    valid_count += valid
+                    if index is not None:
+                        index.update(index_entries)
+                    for tier, count in parse_stats.items():
+                        self.parse_stats[tier] += count
+
+                quarantine_path = quarantine_filename(output_filename)
+                for path, header, suffix in ((output_filename, self.output_columns, ''),
+                                             (quarantine_path, QUARANTINE_COLUMNS, '.quarantine')):
+                    with open(path, 'w', newline='', encoding='utf-8') as merged:
+                        csv.writer(merged, delimiter='\t').writerow(header)
+                        for task in tasks:
+                            with open(task[3] + suffix, 'r', newline='', encoding='utf-8') as part:
+                                shutil.copyfileobj(part, merged)
+            finally:
+                shutil.rmtree(part_dir, ignore_errors=True)
+
+            print(f"Processing complete!")
+            print(f"Total objects found: {processed_count}")
+            print(f"Successfully parsed: {valid_count}")
+            self.report_parse_stats()
+            report_quarantine(quarantine_path, processed_count - valid_count)
+            if index is not None:
+                print(f"Indexed {len(index.entries)} accessions in {index.save()}")
+            print(f"Successfully converted {valid_count} datasets to {output_filename}")
+            return True
+
+        except Exception as e:
+            print(f"Error converting to TSV: {e}")
+            return False
+
+    def convert_to_tsv_pipelined(self, input_filename: str, output_filename: str, workers: int,
+                                 build_index: bool = False) -> bool:
+        """
+        Convert JSON file to TSV format with reading, parsing and writing overlapped.
+
+        A reader thread reads (and decompresses) the input in blocks and cuts
+        it into batches of raw objects, a pool of worker processes parses and
+        formats the batches, and a writer thread writes each batch's rows with
+        one writerows call. The stages are connected by bounded queues, so a
+        slow stage holds back the ones before it instead of letting batches
+        pile up in memory, and rows are written in input order. Unlike
+        convert_to_tsv_parallel this also works on compressed input.
+
+        Args:
+            input_filename: Input JSON file (plain or gzip/bz2/xz/zstd-compressed)
+            output_filename: Output TSV file
+            workers: Number of parse/format worker processes
+            build_index: Also write the accession index of the input (see object_index.py)
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            print(f"Converting {input_filename} to {output_filename} with a {workers}-worker pipeline")
+            print("=" * 50)
+
+            stages = [PipelineStage('read'), PipelineStage('parse/format', workers), PipelineStage('write')]
+            read_stage, parse_stage, write_stage = stages
+            batches: queue.Queue = queue.Queue(PIPELINE_READ_AHEAD)
+            results: queue.Queue = queue.Queue(PIPELINE_WRITE_BEHIND)
+            stopping = threading.Event()
+            index = ObjectIndex(input_filename) if build_index else None
+            quarantine_path = quarantine_filename(output_filename)
+            counts = {'processed': 0, 'valid': 0}
+            errors: List[BaseException] = []
+
+            reader = threading.Thread(target=read_batches, name="read", daemon=True,
+                                      args=(input_filename, batches, read_stage, stopping))
+            writer = threading.Thread(target=self._write_batches, name="write", daemon=True,
+                                      args=(output_filename, quarantine_path, results, write_stage,
+                                            index, counts, errors, stopping))
+            started = time.perf_counter()
+            reader.start()
+            writer.start()
+            try:
+                with Pool(workers) as pool:
+                    pending = deque()
+                    while True:
+                        batch = parse_stage.get(batches)
+                        if isinstance(batch, BaseException):
+                            raise batch
+                        if batch is None:
+                            break
+                        pending.append(pool.apply_async(convert_batch, (batch,)))
+                        # Wait for the oldest batch once enough are queued in the pool
+                        while len(pending) >= workers * PIPELINE_IN_FLIGHT_PER_WORKER or \
+                                (pending and pending[0].ready()):
+                            result = pending.popleft().get()
+                            parse_stage.record(result[0], result[1], result[2])
+                            parse_stage.put(results, result)
+                    while pending:
+                        result = pending.popleft().get()
+                        parse_stage.record(result[0], result[1], result[2])
+                        parse_stage.put(results, result)
+            finally:
+                # Unblock the reader if it is waiting for room, then tell the
+                # writer that no more batches are coming
+                stopping.set()
+                while reader.is_alive():
+                    try:
+                        batches.get_nowait()
+                    except queue.Empty:
+                        pass
+                    reader.join(0.01)
+                results.put(None)
+                writer.join()
+            elapsed = time.perf_counter() - started
+            if errors:
+                raise errors[0]
+
+            processed_count, valid_count = counts['processed'], counts['valid']
+            print(f"Processing complete!")
+            print(f"Total objects found: {processed_count}")
+            print(f"Successfully parsed: {valid_count}")
+            self.report_parse_stats()
+            report_pipeline(stages, elapsed)
+            report_quarantine(quarantine_path, processed_count - valid_count)
+            if index is not None:
+                print(f"Indexed {len(index.entries)} accessions in {index.save()}")
+            print(f"Successfully converted {valid_count} datasets to {output_filename}")
+            return True
+
+        except Exception as e:
+            print(f"Error converting to TSV: {e}")
+            return False
+
+    def _write_batches(self, output_filename: str, quarantine_path: str, results: queue.Queue,
+                       stage: 'PipelineStage', index: Optional[ObjectIndex], counts: Dict[str, int],
+                       errors: List[BaseException], stopping: threading.Event) -> None:
+        """Writer stage of convert_to_tsv_pipelined; runs until it receives None."""
+        try:
+            with open(output_filename, 'w', newline='', encoding='utf-8') as tsvfile, \
+                    open(quarantine_path, 'w', newline='', encoding='utf-8') as quarantine:
+                writer = csv.writer(tsvfile, delimiter='\t')
+                quarantine_writer = csv.writer(quarantine, delimiter='\t')
+                writer.writerow(self.output_columns)
+                quarantine_writer.writerow(QUARANTINE_COLUMNS)
+
+                while True:
+                    result = stage.get(results)
+                    if result is None:
+                        return
+                    objects, batch_bytes, _, rows, quarantined, index_entries, parse_stats = result
+                    began = time.perf_counter()
+                    writer.writerows(rows)
+                    quarantine_writer.writerows(quarantined)
+                    if index is not None:
+                        index.update(index_entries)
+                    for tier, count in parse_stats.items():
+                        self.parse_stats[tier] += count
+                    stage.record(objects, batch_bytes, time.perf_counter() - began)
+
+                    if (counts['processed'] + objects) // 1000 > counts['processed'] // 1000:
+                        print(f"Found {counts['processed'] + objects} objects, "
+                              f"parsed {counts['valid'] + len(rows)} successfully...")
+                    counts['processed'] += objects
+                    counts['valid'] += len(rows)
+        except BaseException as e:
+            errors.append(e)
+            stopping.set()
+            # Keep consuming so the stages upstream can finish
+            while results.get() is not None:
+                pass
+
+    def reprocess_quarantine(self, input_filename: str, output_filename: str) -> bool:
+        """
+        Retry the objects listed in the quarantine sidecar of a previous run.
+
+        Each object is read by seeking straight to its recorded offset, so the
+        rest of the input is not scanned again (compressed input is
+        decompressed up to the last offset, since the entries are in file
+        order). Recovered
+        rows are appended to the output TSV and the sidecar is rewritten with
+        the objects that still fail.
+
+        Args:
+            input_filename: Input JSON file of the original conversion
+            output_filename: Output TSV file of the original conversion
+
+        Returns:
+            True if successful, False otherwise
+        """
+        quarantine_path = quarantine_filename(output_filename)
+        try:
+            with open(quarantine_path, 'r', newline='', encoding='utf-8') as quarantine:
+                entries = list(csv.DictReader(quarantine, delimiter='\t'))
+            print(f"Reprocessing {len(entries)} quarantined objects from {input_filename}")
+
+            recovered_count = 0
+            remaining = []
+            with open_binary_input(input_filename) as f, \
+                    open(output_filename, 'a', newline='', encoding='utf-8') as tsvfile:
+                writer = csv.writer(tsvfile, delimiter='\t')
+                for entry in entries:
+                    offset, length = int(entry['offset']), int(entry['length'])
+                    f.seek(offset)
+                    dataset = self.parse_json_object(f.read(length).decode('utf-8', 'replace'))
+                    if dataset:
+                        recovered_count += 1
+                        writer.writerow(self.dataset_to_row(dataset))
+                    else:
+                        remaining.append([offset, length, self.last_error])
+
+            with open(quarantine_path, 'w', newline='', encoding='utf-8') as quarantine:
+                quarantine_writer = csv.writer(quarantine, delimiter='\t')
+                quarantine_writer.writerow(QUARANTINE_COLUMNS)
+                quarantine_writer.writerows(remaining)
+
+            print(f"Recovered {recovered_count} datasets, appended to {output_filename}")
+            self.report_parse_stats()
+            report_quarantine(quarantine_path, len(remaining))
+            return True
+
+        except FileNotFoundError as e:
+            print(f"Error: {e.filename} not found")
+            return False
+        except Exception as e:
+            print(f"Error reprocessing quarantine: {e}")
+            return False
+
+def quarantine_filename(output_filename: str) -> str:
+    """Sidecar listing the objects of a conversion that could not be parsed."""
+    return output_filename + '.quarantine'
+
+def report_quarantine(quarantine_path: str, failed_count: int) -> None:
+    """Point at the sidecar, or remove it when every object was parsed."""
+    if failed_count:
+        print(f"Quarantined {failed_count} unparseable objects in {quarantine_path}")
+    elif os.path.exists(quarantine_path):
+        os.remove(quarantine_path)
+
+def convert_shard(task: Tuple[str, int, int, str]) -> Tuple[int, int, int, Dict[str, int], List[Tuple[str, int, int]]]:
+    """
+    Convert the objects starting in one byte range of a JSON file.
+
+    Args:
+        task: (input file, range start, range end, part file for the rows;
+            unparseable objects go to the part file + '.quarantine')
+
+    Returns:
+        (objects found, objects parsed, offset of the next object after the
+        range, objects per repair tier, (accession, offset, length) of the
+        parsed objects)
+    """
+    input_filename, start, limit, part_filename = task
+    parser = StreamingJSONParser()
+    processed_count = 0
+    valid_count = 0
+    next_start = [0]
+    index_entries = []
+
+    with map_file(input_filename) as buf, \
+            open(part_filename, 'w', newline='', encoding='utf-8') as part, \
+            open(part_filename + '.quarantine', 'w', newline='', encoding='utf-8') as quarantine:
+        writer = csv.writer(part, delimiter='\t')
+        quarantine_writer = csv.writer(quarantine, delimiter='\t')
+        for obj_start, obj_end in iter_shard_spans(buf, start, limit, next_start):
+            processed_count += 1
+            # Invalid UTF-8 is replaced, as in the serial and pipelined conversions
+            dataset = parser.parse_json_object(buf[obj_start:obj_end].decode('utf-8', 'replace'))
+            try:
+                row = parser.dataset_to_row(dataset) if dataset else None
+            except Exception as e:
+                # One odd object must not fail the worker, and with it the whole conversion
+                row = None
+                parser.last_error = f"Could not convert to a row: {e}"
+            if row is not None:
+                valid_count += 1
+                writer.writerow(row)
+                index_entries.append((row[0], obj_start, obj_end - obj_start))
+            else:
+                quarantine_writer.writerow([obj_start, obj_end - obj_start, parser.last_error])
+
+    return processed_count, valid_count, next_start[0], parser.parse_stats, index_entries
+
+class PipelineStage:
+    """Throughput of one stage of convert_to_tsv_pipelined and the time it spent waiting on its queues."""
+
+    def __init__(self, name: str, workers: int = 1):
+        self.name = name
+        self.workers = workers
+        self.objects = 0
+        self.bytes = 0
+        # Seconds spent working (summed over workers), waiting for input and
+        # waiting for room in the next stage's queue
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+
+    def record(self, objects: int, nbytes: int, busy: float) -> None:
+        self.objects += objects
+        self.bytes += nbytes
+        self.busy += busy
+
+    def get(self, source: queue.Queue) -> Any:
+        began = time.perf_counter()
+        item = source.get()
+        self.starved += time.perf_counter() - began
+        return item
+
+    def put(self, target: queue.Queue, item: Any) -> None:
+        began = time.perf_counter()
+        target.put(item)
+        self.blocked += time.perf_counter() - began
+
+def report_pipeline(stages: List[PipelineStage], elapsed: float) -> None:
+    """Print each stage's throughput; the stage with the most work per worker bounds the pipeline."""
+    print(f"Pipeline stages ({elapsed:.1f}s wall):")
+    for stage in stages:
+        busy = stage.busy / stage.workers
+        rate = stage.bytes / busy / 1e6 if busy else float('inf')
+        workers = f" per worker x{stage.workers}" if stage.workers > 1 else ""
+        print(f"  {stage.name}: {stage.objects} objects, {stage.bytes / 1e6:.1f} MB of input, "
+              f"busy {busy:.1f}s{workers} ({rate:.1f} MB/s), "
+              f"waited {stage.starved:.1f}s for input and {stage.blocked:.1f}s for the next stage")
+    bottleneck = max(stages, key=lambda stage: stage.busy / stage.workers)
+    print(f"Bottleneck: {bottleneck.name}")
+
+def read_batches(input_filename: str, batches: queue.Queue, stage: PipelineStage,
+                 stopping: threading.Event) -> None:
+    """
+    Reader stage of convert_to_tsv_pipelined.
+
+    Puts lists of (byte offset, object bytes) of about PIPELINE_BATCH_BYTES
+    on the queue, then None (or the exception that stopped the read).
+    """
+    try:
+        with open_binary_input(input_filename) as f:
+            batch = []
+            batch_bytes = 0
+            began = time.perf_counter()
+            for offset, raw in iter_raw_objects(iter_byte_chunks(f)):
+                batch.append((offset, raw))
+                batch_bytes += len(raw)
+                if batch_bytes >= PIPELINE_BATCH_BYTES:
+                    stage.record(len(batch), batch_bytes, time.perf_counter() - began)
+                    if stopping.is_set():
+                        break
+                    stage.put(batches, batch)
+                    batch = []
+                    batch_bytes = 0
+                    began = time.perf_counter()
+            else:
+                if batch:
+                    stage.record(len(batch), batch_bytes, time.perf_counter() - began)
+                    stage.put(batches, batch)
+        batches.put(None)
+    except BaseException as e:
+        batches.put(e)
+
+def convert_batch(batch: List[Tuple[int, bytes]]) -> Tuple[int, int, float, List[List[str]], List[list],
+                                                           List[Tuple[str, int, int]], Dict[str, int]]:
+    """
+    Parse and format one batch of raw objects (worker of convert_to_tsv_pipelined).
+
+    Returns:
+        (objects, bytes, seconds spent, rows, quarantine rows, (accession,
+        offset, length) of the parsed objects, objects per repair tier)
+    """
+    began = time.perf_counter()
+    parser = StreamingJSONParser()
+    rows = []
+    quarantined = []
+    index_entries = []
+    batch_bytes = 0
+    for offset, raw in batch:
+        batch_bytes += len(raw)
+        dataset = parser.parse_json_object(raw.decode('utf-8', 'replace'))
+        if dataset:
+            row = parser.dataset_to_row(dataset)
+            rows.append(row)
+            index_entries.append((row[0], offset, len(raw)))
+        else:
+            quarantined.append([offset, len(raw), parser.last_error])
+    return (len(batch), batch_bytes, time.perf_counter() - began, rows, quarantined, index_entries,
+            parser.parse_stats)
+
 def main():
     """Main function."""
-    if len(sys.argv) < 2:
-        print("Usage: python streaming_json_parser.py <json_file> [output_file]")
-        print("  <json_file>: Path to the input JSON file")
-        print("  [output_file]: Optional output TSV file path")
-        return
+    arg_parser = argparse.ArgumentParser(description="Convert a large PRIDE JSON dump to TSV.")
+    arg_parser.add_argument('json_file', help="Path to the input JSON file (plain or gzip/bz2/xz/zstd-compressed)")
+    arg_parser.add_argument('output_file', nargs='?', help="Optional output TSV file path")
+    arg_parser.add_argument('--workers', type=int, default=1,
+                            help="Worker processes for parsing and formatting")
+    arg_parser.add_argument('--pipeline', action='store_true',
+                            help="Overlap reading, parsing and writing in separate stages and report each "
+                                 "stage's throughput (the default for compressed input with --workers)")
+    arg_parser.add_argument('--index', action='store_true',
+                            help="Also write an accession -> byte range index of the input for object_index.py")
+    arg_parser.add_argument('--reprocess', action='store_true',
+                            help="Retry only the objects quarantined by a previous run of the same conversion")
+    args = arg_parser.parse_args()
     
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
+    input_file = args.json_file
+    output_file = args.output_file
     
     if output_file is None:
-        output_file = input_file.replace('.json', '_streaming.tsv')
+        output_file = strip_compression_suffix(input_file).replace('.json', '_streaming.tsv')
     
     parser = StreamingJSONParser()
-    success = parser.convert_to_tsv(input_file, output_file)
+    if args.reprocess:
+        success = parser.reprocess_quarantine(input_file, output_file)
+    elif args.pipeline:
+        success = parser.convert_to_tsv_pipelined(input_file, output_file, max(args.workers, 1), args.index)
+    elif args.workers > 1:
+        success = parser.convert_to_tsv_parallel(input_file, output_file, args.workers, args.index)
+    else:
+        success = parser.convert_to_tsv(input_file, output_file, args.index)
     
     if success:
         print(f"\nConversion complete!")
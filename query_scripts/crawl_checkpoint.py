@@ -0,0 +1,104 @@
+"""
+On-disk checkpoints for long PRIDE paging runs.
+
+Every page's raw project list is written to the checkpoint directory as soon
+as it arrives, together with a cursor file recording the crawl parameters
+and the first page not yet completed. A resumed crawl serves completed pages
+from disk and only fetches what is missing, so a crash costs at most the
+pages that were in flight.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+
+class CrawlCheckpoint:
+    """Per-page raw responses plus a cursor, bound to one set of crawl parameters."""
+
+    def __init__(self, checkpoint_dir, fingerprint):
+        self.checkpoint_dir = checkpoint_dir
+        self.fingerprint = fingerprint
+        self.completed = set()
+        self.end_page = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_fingerprint(url, params):
+        """Identify a crawl by its endpoint and page-independent parameters."""
+        stable = {k: v for k, v in params.items() if k != "page"}
+        return hashlib.sha256(json.dumps([url, stable], sort_keys=True).encode("utf-8")).hexdigest()
+
+    @property
+    def cursor_path(self):
+        return os.path.join(self.checkpoint_dir, "cursor.json")
+
+    def page_path(self, page):
+        return os.path.join(self.checkpoint_dir, f"page_{page:05d}.json")
+
+    @property
+    def next_page(self):
+        """First page that has not been completed yet."""
+        page = 0
+        while page in self.completed:
+            page += 1
+        return page
+
+    def start(self, resume):
+        """
+        Prepare the checkpoint directory.
+
+        Args:
+            resume: Keep completed pages from a previous run with the same parameters
+
+        Returns:
+            Number of pages recovered from disk
+        """
+        if resume and os.path.exists(self.cursor_path):
+            with open(self.cursor_path, "r", encoding="utf-8") as f:
+                cursor = json.load(f)
+            if cursor.get("fingerprint") == self.fingerprint:
+                self.completed = {page for page in cursor.get("completed", [])
+                                  if os.path.exists(self.page_path(page))}
+                self.end_page = cursor.get("end_page")
+                return len(self.completed)
+            print("Checkpoint belongs to a different query; starting a fresh crawl.")
+
+        self.clear()
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        return 0
+
+    def load_page(self, page):
+        """Raw project list for a completed page, or None if it must be fetched."""
+        if page not in self.completed:
+            return None
+        with open(self.page_path(page), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_page(self, page, projects):
+        """Persist one page, then advance the cursor."""
+        tmp_path = self.page_path(page) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(projects, f)
+        os.replace(tmp_path, self.page_path(page))
+
+        with self._lock:
+            self.completed.add(page)
+            if not projects and (self.end_page is None or page < self.end_page):
+                self.end_page = page
+            cursor = {
+                "fingerprint": self.fingerprint,
+                "completed": sorted(self.completed),
+                "next_page": self.next_page,
+                "end_page": self.end_page,
+            }
+            tmp_path = self.cursor_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(cursor, f)
+            os.replace(tmp_path, self.cursor_path)
+
+    def clear(self):
+        """Remove the checkpoint once the crawl it covers has been saved."""
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
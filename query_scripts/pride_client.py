@@ -0,0 +1,184 @@
+"""
+Shared HTTP client for the PRIDE / ProteomeXchange fetchers.
+
+One pooled `requests.Session` keeps TCP/TLS connections alive across pages,
+and every request goes through a bounded retry loop with jittered exponential
+backoff on 429/5xx responses and connection errors, honouring Retry-After.
+JSON lookups can optionally be served from a persistent ResponseCache, and
+every request that does go out can be paced by a shared RateLimiter.
+"""
+
+import contextlib
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Statuses worth retrying: throttling and transient server-side failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value):
+    """Return the Retry-After delay in seconds, or None if absent/unparseable."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class PrideClient:
+    """Pooled keep-alive session with retry/backoff, safe to share across threads."""
+
+    def __init__(self, pool_size=16, max_retries=5, backoff_base=1.0, backoff_max=60.0, timeout=60,
+                 cache=None, limiter=None):
+        self.cache = cache
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.retry_count = 0
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers["Accept"] = "application/json"
+        # Retries are handled here rather than by urllib3 so Retry-After and
+        # the jitter apply uniformly to status codes and connection errors
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff for the given (0-based) retry attempt."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _limit(self, slot_held):
+        """Limiter context for one attempt: slot and token, or just a token if the caller holds a slot."""
+        if self.limiter is None:
+            return contextlib.nullcontext()
+        return self.limiter.token() if slot_held else self.limiter
+
+    def get(self, url, params=None, slot_held=False, **kwargs):
+        """
+        GET with retries on throttling, 5xx and connection errors.
+
+        Args:
+            url: Endpoint URL
+            params: Query parameters
+            slot_held: The caller holds a limiter concurrency slot (see
+                iter_body), so each attempt only takes a rate token
+            **kwargs: Passed through to requests (headers, stream, ...)
+
+        Returns:
+            The final response; after the last retry a 429/5xx is returned as-is
+
+        Raises:
+            requests.ConnectionError / requests.Timeout once retries are exhausted
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._limit(slot_held):
+                    r = self.session.get(url, params=params, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                reason = type(e).__name__
+            else:
+                if r.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return r
+                retry_after = parse_retry_after(r.headers.get("Retry-After"))
+                delay = min(self.backoff_max, retry_after) if retry_after is not None else self.backoff_delay(attempt)
+                reason = f"HTTP {r.status_code}"
+                r.close()
+
+            with self._lock:
+                self.retry_count += 1
+            print(f"Retrying {url} in {delay:.1f}s after {reason} "
+                  f"(attempt {attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+
+    def get_json(self, url, params=None, **kwargs):
+        """GET and decode JSON, raising requests.HTTPError on a final non-2xx."""
+        if self.cache is not None:
+            return json.loads(b"".join(self.iter_body(url, params, **kwargs)))
+        r = self.get(url, params=params, **kwargs)
+        r.raise_for_status()
+        return r.json()
+
+    def iter_body(self, url, params=None, chunk_size=64 * 1024, **kwargs):
+        """
+        Yield the response body in chunks without buffering it whole.
+
+        With a cache configured, fresh entries are read from disk, stale
+        entries carrying an ETag or Last-Modified are revalidated with a
+        conditional GET, and fetched bodies are written through to the cache.
+        A request counts against the limiter's in-flight cap until its body
+        has been read, not just until the headers arrive.
+
+        Raises:
+            requests.HTTPError on a final non-2xx response
+        """
+        meta = None
+        headers = dict(kwargs.pop("headers", None) or {})
+        if self.cache is not None:
+            meta = self.cache.lookup(url, params)
+            if meta is not None and meta["fresh"]:
+                self.cache.record("hits")
+                yield from self.cache.read_chunks(meta, chunk_size)
+                return
+            if meta is not None:
+                headers.update(self.cache.conditional_headers(meta))
+
+        with self.limiter.slot() if self.limiter is not None else contextlib.nullcontext():
+            r = self.get(url, params=params, slot_held=True, headers=headers, stream=True, **kwargs)
+            with r:
+                if r.status_code == 304 and meta is not None:
+                    self.cache.mark_revalidated(meta)
+                    self.cache.record("revalidated")
+                    yield from self.cache.read_chunks(meta, chunk_size)
+                    return
+
+                r.raise_for_status()
+                chunks = r.iter_content(chunk_size)
+                if self.cache is not None:
+                    self.cache.record("misses")
+                    chunks = self.cache.store_stream(url, params, r.headers, chunks)
+                yield from chunks
+
+    def close(self):
+        self.session.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide shared client, creating it on first use."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = PrideClient()
+        return _default_client
+
+
+def configure_client(**kwargs):
+    """Replace the shared client with one built from PrideClient keyword arguments."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is not None:
+            _default_client.close()
+        _default_client = PrideClient(**kwargs)
+        return _default_client
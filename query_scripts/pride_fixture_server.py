@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the PRIDE archive `/projects` endpoint.
+
+Serves canned project pages (from a JSON file or generated on the fly) with
+an injected per-request latency, so the fetchers in test_query.py can be
+exercised and timed without touching the EBI servers:
+
+    python pride_fixture_server.py --port 8765 --latency 0.5
+    python test_query.py --base-url http://127.0.0.1:8765/search/projects --concurrency 8
+
+Both the legacy `/projects?q=&page=&size=` listing and the v2
+`/search/projects?keyword=&filter=&page=&pageSize=` search are served; the
+latter applies keyword and `field==value` facet filters and date sorting
+like PRIDE does. `/proxi/datasets?keywords=&pageNumber=&pageSize=` serves the
+same projects in PROXI format, standing in for MassIVE, jPOST or iProX
+(see proteomexchange.py).
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_projects(count, prefix="PXD"):
+    """Generate `count` synthetic projects; every tenth one passes the strict filter."""
+    projects = []
+    for i in range(count):
+        matching = i % 10 == 0
+        submitted = datetime.date(2015, 1, 1) + datetime.timedelta(days=i)
+        projects.append({
+            "accession": f"{prefix}{i:06d}",
+            "title": f"Immunopeptidomics of cancer cell lines {i}" if matching else f"Proteome study {i}",
+            "instruments": ["timsTOF Pro"] if matching else ["Q Exactive"],
+            "diseases": ["cancer"] if matching else ["normal"],
+            "sampleProcessing": "cell line lysates, tissue" if matching else "plasma",
+            "projectDescription": "x" * 200,
+            "ftpLinks": [f"ftp://ftp.pride.ebi.ac.uk/pride/data/archive/PXD{i:06d}"],
+            "submissionDate": submitted.isoformat(),
+            "publicationDate": (submitted + datetime.timedelta(days=90)).isoformat(),
+        })
+    return projects
+
+
+def to_proxi(project):
+    """Render a PRIDE-style project as a PROXI v0.1 dataset."""
+    identifiers = [{"accession": "MS:1001919", "name": "ProteomeXchange accession number",
+                    "value": project["accession"]}]
+    if project.get("pxd"):
+        identifiers.append({"accession": "MS:1001919", "name": "ProteomeXchange accession number",
+                            "value": project["pxd"]})
+    publications = []
+    if project.get("doi"):
+        publications.append({"identifiers": [{"name": "Digital Object Identifier (DOI)",
+                                              "value": project["doi"]}]})
+    return {
+        "identifiers": identifiers,
+        "title": project.get("title"),
+        "summary": project.get("projectDescription"),
+        "instruments": [{"name": name} for name in project.get("instruments") or []],
+        "species": [[{"name": "Homo sapiens"}]],
+        "keywords": [{"name": "submitter keyword", "value": d} for d in project.get("diseases") or []],
+        "publications": publications,
+    }
+
+
+SORT_KEYS = {"submission_date": "submissionDate", "publication_date": "publicationDate"}
+
+
+def search_projects(projects, keyword, facet_filter, sort_field="", sort_direction="DESC"):
+    """Apply PRIDE-style search: every keyword word present, every facet matched exactly."""
+    words = keyword.lower().split()
+    facets = [clause.split("==", 1) for clause in facet_filter.split(",") if "==" in clause]
+    matched = []
+    for project in projects:
+        text = json.dumps(project).lower()
+        if not all(word in text for word in words):
+            continue
+        if not all(value in (project.get(field) or []) for field, value in facets):
+            continue
+        matched.append(project)
+    if sort_field in SORT_KEYS:
+        matched.sort(key=lambda p: p.get(SORT_KEYS[sort_field]) or "",
+                     reverse=sort_direction.upper() == "DESC")
+    return matched
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Answers `GET /projects` and `GET /search/projects` from the server's project list."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.rstrip("/")
+        if path not in ("/projects", "/search/projects", "/proxi/datasets"):
+            self.send_error(404)
+            return
+
+        params = parse_qs(url.query)
+        page = int(params.get("page", ["0"])[0])
+
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.request_count += 1
+
+        if random.random() < self.server.error_rate:
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if path == "/proxi/datasets":
+            size = int(params.get("pageSize", ["100"])[0])
+            number = int(params.get("pageNumber", ["1"])[0]) - 1
+            matched = search_projects(self.server.projects, params.get("keywords", [""])[0], "")
+            body = json.dumps([to_proxi(p) for p in matched[number * size:(number + 1) * size]]).encode("utf-8")
+        elif path == "/search/projects":
+            size = int(params.get("pageSize", ["100"])[0])
+            matched = search_projects(self.server.projects, params.get("keyword", [""])[0],
+                                      params.get("filter", [""])[0],
+                                      params.get("sortFields", [""])[0],
+                                      params.get("sortDirection", ["DESC"])[0])
+            projects = matched[page * size:(page + 1) * size]
+            body = json.dumps({"_embedded": {"compactprojects": projects},
+                               "page": {"size": size, "number": page,
+                                        "totalElements": len(matched)}}).encode("utf-8")
+        else:
+            size = int(params.get("size", params.get("pageSize", ["100"]))[0])
+            projects = self.server.projects[page * size:(page + 1) * size]
+            body = json.dumps({"list": projects}).encode("utf-8")
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def start_fixture_server(projects, latency=0.0, host="127.0.0.1", port=0, verbose=False,
+                         error_rate=0.0):
+    """
+    Start the stand-in server on a background thread.
+
+    Args:
+        projects: List of raw PRIDE project dicts to serve
+        latency: Seconds to sleep before answering each request
+        host: Interface to bind
+        port: Port to bind (0 picks a free one)
+        verbose: Log every request to stderr
+        error_rate: Fraction of requests answered with 503 + Retry-After
+
+    Returns:
+        (server, base_url) for `/projects`; the search and PROXI endpoints
+        are at server.search_url and server.proxi_url. Call server.shutdown()
+        when done.
+    """
+    server = ThreadingHTTPServer((host, port), FixtureHandler)
+    server.daemon_threads = True
+    server.projects = projects
+    server.latency = latency
+    server.verbose = verbose
+    server.error_rate = error_rate
+    server.request_count = 0
+    server.lock = threading.Lock()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    root = f"http://{host}:{server.server_address[1]}"
+    server.search_url = root + "/search/projects"
+    server.proxi_url = root + "/proxi/datasets"
+    return server, root + "/projects"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve canned PRIDE /projects pages locally.")
+    parser.add_argument("--projects", help="JSON file with a list of raw PRIDE projects")
+    parser.add_argument("--count", type=int, default=1500,
+                        help="Number of synthetic projects when --projects is not given")
+    parser.add_argument("--prefix", default="PXD",
+                        help="Accession prefix of synthetic projects (e.g. MSV, JPST, IPX)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds of delay per request")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests that fail with a transient 503")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.projects:
+        with open(args.projects, "r", encoding="utf-8") as f:
+            projects = json.load(f)
+    else:
+        projects = make_projects(args.count, args.prefix)
+
+    server, base_url = start_fixture_server(projects, args.latency, args.host, args.port,
+                                           verbose=True, error_rate=args.error_rate)
+    print(f"Serving {len(projects)} projects at {base_url}, {server.search_url} and {server.proxi_url} "
+          f"(latency {args.latency}s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
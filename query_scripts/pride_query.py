@@ -0,0 +1,101 @@
+"""
+Query builder that pushes filter criteria down to the PRIDE search API.
+
+PRIDE's v2 search endpoint takes a free-text `keyword` (all words must match)
+and a `filter` of exact facet matches (`field==value`, comma-joined, ANDed).
+Each criterion is registered with how far the server can evaluate it:
+
+- facet(): exact facet match, evaluated entirely server-side;
+- keyword(): narrows the result set server-side, but PRIDE's full-text match
+  covers different fields than our predicate, so the predicate is kept as a
+  client-side residual;
+- client_side(): not expressible in the API at all (e.g. OR groups).
+
+Only the residual predicates are evaluated on the returned projects.
+"""
+
+import copy
+
+SEARCH_URL = "https://www.ebi.ac.uk/pride/ws/archive/v2/search/projects"
+
+# Our criterion names -> PRIDE search facet fields
+FACET_FIELDS = {
+    "instrument": "instruments",
+    "disease": "diseases",
+    "organism": "organisms",
+    "keyword": "project_keywords",
+}
+
+# Project record date fields -> PRIDE search sort fields
+SORT_FIELDS = {
+    "submissionDate": "submission_date",
+    "publicationDate": "publication_date",
+}
+
+
+class PrideSearchQuery:
+    """Structured PRIDE search: server-side keyword/facet parameters plus client-side residuals."""
+
+    def __init__(self, url=SEARCH_URL):
+        self.url = url
+        self.keywords = []
+        self.facets = []
+        self.residual = []
+        self.sort_field = None
+        self.sort_direction = "DESC"
+
+    def keyword(self, *terms, verify=None, name=None):
+        """
+        Require every term in PRIDE's full-text search.
+
+        Args:
+            terms: Words passed in the `keyword` parameter
+            verify: Client-side predicate with the exact semantics, kept as a residual
+            name: Label for the residual predicate in plan descriptions
+        """
+        self.keywords.extend(terms)
+        if verify is not None:
+            self.residual.append((name or " ".join(terms), verify))
+        return self
+
+    def facet(self, criterion, value):
+        """Require an exact facet value; fully evaluated server-side."""
+        if criterion not in FACET_FIELDS:
+            raise ValueError(f"PRIDE search has no facet for '{criterion}'")
+        self.facets.append((FACET_FIELDS[criterion], value))
+        return self
+
+    def client_side(self, name, predicate):
+        """Add a predicate the API cannot express."""
+        self.residual.append((name, predicate))
+        return self
+
+    def sorted_by(self, date_field, direction="DESC"):
+        """Copy of this query with results ordered by a project date field."""
+        query = copy.copy(self)
+        query.sort_field = SORT_FIELDS[date_field]
+        query.sort_direction = direction
+        return query
+
+    def params(self, page, size):
+        """Request parameters for one result page."""
+        params = {"page": page, "pageSize": size}
+        if self.sort_field:
+            params["sortFields"] = self.sort_field
+            params["sortDirection"] = self.sort_direction
+        if self.keywords:
+            params["keyword"] = " ".join(self.keywords)
+        if self.facets:
+            params["filter"] = ",".join(f"{field}=={value}" for field, value in self.facets)
+        return params
+
+    def matches(self, project):
+        """Evaluate the residual (client-side) predicates only."""
+        return all(predicate(project) for _, predicate in self.residual)
+
+    def describe(self):
+        lines = [f"Server-side keyword: {' '.join(self.keywords) or '-'}",
+                 f"Server-side facets: {', '.join(f'{f}=={v}' for f, v in self.facets) or '-'}",
+                 f"Client-side residual: {', '.join(name for name, _ in self.residual) or '-'}"]
+        return "\n".join(lines)
+
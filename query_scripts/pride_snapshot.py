@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Bulk snapshot of the complete PRIDE project catalogue.
+
+Instead of paging the search API 100 projects at a time, this walks the full
+`/projects` listing in large sequential chunks and streams every project
+straight into a gzip-compressed file with one JSON object per line. Each
+chunk is written as its own gzip member and recorded in a progress file, so
+an interrupted download resumes at the first missing chunk.
+
+The converters in PRIDE_archive_query/ (updated_json_parser.py,
+pride_new_parser.py) read the resulting .json.gz directly.
+
+Example:
+    python pride_snapshot.py --output pride_datasets.json.gz --chunk-size 1000
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+import requests
+
+from pride_client import PrideClient
+from rate_limiter import RateLimiter
+from stream_json import iter_array_items
+
+PROJECTS_URL = "https://www.ebi.ac.uk/pride/ws/archive/v2/projects"
+ARRAY_KEYS = ("projects", "compactprojects", "list")
+
+
+class SnapshotProgress:
+    """Completed chunks and the byte length of the snapshot file after them."""
+
+    def __init__(self, path):
+        self.path = path
+        self.chunks_done = 0
+        self.projects = 0
+        self.bytes_written = 0
+
+    @classmethod
+    def load(cls, path):
+        progress = cls(path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            progress.chunks_done = data["chunks_done"]
+            progress.projects = data["projects"]
+            progress.bytes_written = data["bytes_written"]
+        return progress
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"chunks_done": self.chunks_done, "projects": self.projects,
+                       "bytes_written": self.bytes_written}, f)
+        os.replace(tmp_path, self.path)
+
+
+def download_snapshot(output, client, url=PROJECTS_URL, chunk_size=1000, resume=True, max_chunks=None):
+    """
+    Stream the whole project listing into a gzip NDJSON file.
+
+    Args:
+        output: Path of the .json.gz snapshot
+        client: PrideClient used for the requests
+        url: Paged projects listing endpoint
+        chunk_size: Projects requested per page
+        resume: Continue after the last completed chunk of a previous run
+        max_chunks: Stop after this many chunks (None for the whole catalogue)
+
+    Returns:
+        Total number of projects in the snapshot
+    """
+    progress_path = output + ".progress.json"
+    progress = SnapshotProgress.load(progress_path) if resume else SnapshotProgress(progress_path)
+
+    # Drop any partial gzip member left by a crash after the last recorded chunk
+    mode = "r+b" if progress.chunks_done and os.path.exists(output) else "wb"
+    if mode == "wb":
+        progress = SnapshotProgress(progress_path)
+    else:
+        print(f"Resuming at chunk {progress.chunks_done} ({progress.projects} projects already saved)")
+
+    started = time.time()
+    with open(output, mode) as raw:
+        raw.truncate(progress.bytes_written)
+        raw.seek(progress.bytes_written)
+
+        page = progress.chunks_done
+        last_page = None if max_chunks is None else page + max_chunks
+        while last_page is None or page < last_page:
+            body = client.iter_body(url, {"page": page, "pageSize": chunk_size})
+            count = 0
+            with gzip.GzipFile(fileobj=raw, mode="wb") as member:
+                for project in iter_array_items(body, ARRAY_KEYS):
+                    member.write(json.dumps(project).encode("utf-8") + b"\n")
+                    count += 1
+            raw.flush()
+            os.fsync(raw.fileno())
+
+            if count == 0:
+                # An empty trailing member is harmless but pointless; cut it off
+                raw.truncate(progress.bytes_written)
+                break
+
+            page += 1
+            progress.chunks_done = page
+            progress.projects += count
+            progress.bytes_written = raw.tell()
+            progress.save()
+
+            elapsed = max(time.time() - started, 1e-9)
+            print(f"Chunk {page}: {progress.projects} projects, "
+                  f"{progress.bytes_written / 1e6:.1f} MB compressed, "
+                  f"{progress.projects / elapsed:.0f} projects/s")
+            if count < chunk_size:
+                break
+
+    return progress.projects
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download a compressed snapshot of all PRIDE projects.")
+    parser.add_argument("--output", default="pride_datasets.json.gz")
+    parser.add_argument("--url", default=PROJECTS_URL, help="Paged PRIDE projects listing endpoint")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Projects per request")
+    parser.add_argument("--max-chunks", type=int, help="Stop after this many chunks")
+    parser.add_argument("--restart", action="store_true", help="Ignore previous progress and start over")
+    parser.add_argument("--rate", type=float, default=2, help="Requests per second (0 = unlimited)")
+    args = parser.parse_args()
+
+    client = PrideClient(timeout=300, limiter=RateLimiter(rate=args.rate or None))
+    try:
+        total = download_snapshot(args.output, client, args.url, args.chunk_size,
+                                  resume=not args.restart, max_chunks=args.max_chunks)
+    except requests.RequestException as e:
+        print(f"Error: snapshot download interrupted: {e}")
+        print("Re-run the same command to resume.")
+        sys.exit(1)
+    print(f"Snapshot saved to {args.output} ({total} projects)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Federated ProteomeXchange fetcher covering PRIDE, MassIVE, jPOST and iProX.
+
+Each repository backend pages through its own search API and normalises the
+results into one common project record. The backends run in parallel, so a
+run takes as long as the slowest repository rather than the sum of all of
+them, and the records are merged by ProteomeXchange accession and DOI.
+
+Example:
+    python proteomexchange.py immunopeptidomics --repositories pride massive
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from pride_client import PrideClient
+from rate_limiter import RateLimiter
+from stream_json import iter_array_items
+
+PRIDE_SEARCH_URL = "https://www.ebi.ac.uk/pride/ws/archive/v2/search/projects"
+MASSIVE_PROXI_URL = "https://massive.ucsd.edu/ProteoSAFe/proxi/v0.1/datasets"
+JPOST_PROXI_URL = "https://repository.jpostdb.org/proxi/datasets"
+IPROX_PROXI_URL = "https://www.iprox.cn/proxi/datasets"
+
+# Common project record produced by every backend
+RECORD_FIELDS = ["accession", "repository", "identifiers", "title", "description",
+                 "instruments", "species", "keywords", "diseases", "doi", "links"]
+
+ACCESSION_PATTERN = re.compile(r"^(PXD|MSV|JPST|IPX|RPXD)\d+", re.IGNORECASE)
+DOI_PATTERN = re.compile(r"10\.\d{4,9}/\S+")
+
+
+def _names(values):
+    """Flatten a list of strings / CV params into their values (or term names)."""
+    names = []
+    for value in values or []:
+        if isinstance(value, dict):
+            name = value.get("value") or value.get("name")
+            if name:
+                names.append(str(name))
+        elif isinstance(value, list):
+            names.extend(_names(value))
+        elif value:
+            names.append(str(value))
+    return names
+
+
+def make_record(repository, identifiers, **fields):
+    """Build a common project record; the ProteomeXchange (PXD) id wins as primary accession."""
+    identifiers = [i for i in dict.fromkeys(identifiers) if i]
+    pxd = [i for i in identifiers if i.upper().startswith("PXD")]
+    record = {field: [] for field in RECORD_FIELDS}
+    record.update(fields)
+    record["accession"] = (pxd or identifiers or [None])[0]
+    record["repository"] = [repository]
+    record["identifiers"] = identifiers
+    return record
+
+
+class RepositoryBackend:
+    """One repository's search API: paging plus normalisation to the common record."""
+
+    name = None
+    default_url = None
+    page_size = 100
+    first_page = 0
+    array_keys = ("datasets", "list", "compactprojects")
+
+    def __init__(self, base_url=None, client=None):
+        self.base_url = base_url or self.default_url
+        self.client = client or PrideClient()
+
+    def page_params(self, keywords, page):
+        raise NotImplementedError
+
+    def normalize(self, raw):
+        raise NotImplementedError
+
+    def fetch(self, keywords, max_pages=20):
+        """Page through the search results; returns normalised records."""
+        records = []
+        for page in range(self.first_page, self.first_page + max_pages):
+            body = self.client.iter_body(self.base_url, self.page_params(keywords, page))
+            items = list(iter_array_items(body, self.array_keys))
+            records.extend(self.normalize(item) for item in items if isinstance(item, dict))
+            if len(items) < self.page_size:
+                break
+        return records
+
+
+class PrideBackend(RepositoryBackend):
+    """PRIDE archive v2 search API."""
+
+    name = "PRIDE"
+    default_url = PRIDE_SEARCH_URL
+
+    def page_params(self, keywords, page):
+        return {"keyword": keywords, "page": page, "pageSize": self.page_size}
+
+    def normalize(self, raw):
+        return make_record(
+            self.name, [raw.get("accession")],
+            title=raw.get("title"),
+            description=raw.get("projectDescription"),
+            instruments=_names(raw.get("instruments")),
+            species=_names(raw.get("organisms")),
+            keywords=_names(raw.get("keywords")),
+            diseases=_names(raw.get("diseases")),
+            doi=raw.get("doi") or next(iter(_names(raw.get("references"))), None),
+            links=raw.get("ftpLinks") or [],
+        )
+
+
+class ProxiBackend(RepositoryBackend):
+    """PROXI v0.1 `datasets` endpoint, shared by MassIVE, jPOST and iProX."""
+
+    first_page = 1
+
+    def page_params(self, keywords, page):
+        return {"keywords": keywords, "pageNumber": page, "pageSize": self.page_size,
+                "resultType": "full"}
+
+    def normalize(self, raw):
+        identifiers = _names(raw.get("identifiers"))
+        if isinstance(raw.get("accession"), str):
+            identifiers.insert(0, raw["accession"])
+        identifiers = [i for i in identifiers if ACCESSION_PATTERN.match(i)]
+
+        doi = None
+        for publication in raw.get("publications") or []:
+            match = DOI_PATTERN.search(json.dumps(publication))
+            if match:
+                doi = match.group(0).rstrip('",}]')
+                break
+
+        return make_record(
+            self.name, identifiers,
+            title=raw.get("title"),
+            description=raw.get("summary") or raw.get("description"),
+            instruments=_names(raw.get("instruments")),
+            species=_names(raw.get("species")),
+            keywords=_names(raw.get("keywords")),
+            diseases=_names(raw.get("diseases")),
+            doi=doi,
+            links=_names(raw.get("fullDatasetLinks") or raw.get("datasetLink")),
+        )
+
+
+class MassiveBackend(ProxiBackend):
+    name = "MassIVE"
+    default_url = MASSIVE_PROXI_URL
+
+
+class JpostBackend(ProxiBackend):
+    name = "jPOST"
+    default_url = JPOST_PROXI_URL
+
+
+class IproxBackend(ProxiBackend):
+    name = "iProX"
+    default_url = IPROX_PROXI_URL
+
+
+BACKENDS = {
+    "pride": PrideBackend,
+    "massive": MassiveBackend,
+    "jpost": JpostBackend,
+    "iprox": IproxBackend,
+}
+
+
+def merge_records(records):
+    """
+    Merge records describing the same dataset across repositories.
+
+    Records are linked when they share any identifier (PXD / MSV / ...) or DOI;
+    list fields are unioned and the first non-empty scalar wins.
+    """
+    parent = list(range(len(records)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner = {}
+    for i, record in enumerate(records):
+        keys = [("id", identifier.upper()) for identifier in record["identifiers"]]
+        if record.get("doi"):
+            keys.append(("doi", record["doi"].lower()))
+        for key in keys:
+            if key in owner:
+                parent[find(i)] = find(owner[key])
+            else:
+                owner[key] = i
+
+    groups = {}
+    for i, record in enumerate(records):
+        groups.setdefault(find(i), []).append(record)
+
+    merged = []
+    for group in groups.values():
+        combined = dict(group[0])
+        for record in group[1:]:
+            for field in RECORD_FIELDS:
+                if isinstance(combined.get(field), list):
+                    combined[field] = list(dict.fromkeys(combined[field] + (record.get(field) or [])))
+                elif not combined.get(field):
+                    combined[field] = record.get(field)
+        pxd = [i for i in combined["identifiers"] if i.upper().startswith("PXD")]
+        combined["accession"] = (pxd or combined["identifiers"] or [combined["accession"]])[0]
+        merged.append(combined)
+    return merged
+
+
+def fetch_all(keywords, backends, max_pages=20):
+    """
+    Query every backend in parallel and merge the results.
+
+    Args:
+        keywords: Search keywords
+        backends: RepositoryBackend instances
+        max_pages: Page limit per repository
+
+    Returns:
+        (merged records, {repository name: (record count, seconds) or error string})
+    """
+    def run(backend):
+        started = time.time()
+        try:
+            records = backend.fetch(keywords, max_pages)
+        except requests.RequestException as e:
+            return backend.name, [], f"failed: {e}"
+        except (ValueError, TypeError, KeyError) as e:
+            # Malformed or truncated JSON (JSONDecodeError is a ValueError) or a
+            # record of unexpected shape: lose this repository, not the others
+            return backend.name, [], f"failed: {type(e).__name__}: {e}"
+        return backend.name, records, (len(records), time.time() - started)
+
+    records, report = [], {}
+    with ThreadPoolExecutor(max_workers=len(backends) or 1) as pool:
+        for name, backend_records, outcome in pool.map(run, backends):
+            records.extend(backend_records)
+            report[name] = outcome
+    return merge_records(records), report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search PRIDE, MassIVE, jPOST and iProX in parallel.")
+    parser.add_argument("keywords", help="Search keywords")
+    parser.add_argument("--repositories", nargs="+", choices=sorted(BACKENDS), default=sorted(BACKENDS))
+    parser.add_argument("--base-url", action="append", default=[], metavar="REPO=URL",
+                        help="Override a repository endpoint, e.g. massive=http://127.0.0.1:8766/proxi/datasets")
+    parser.add_argument("--max-pages", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=5,
+                        help="Requests per second allowed against each repository (0 = unlimited)")
+    parser.add_argument("--output", default="proteomexchange_combined.json")
+    args = parser.parse_args()
+
+    overrides = dict(item.split("=", 1) for item in args.base_url)
+    backends = []
+    for name in args.repositories:
+        # One client per repository: fair-use limits are per host
+        client = PrideClient(limiter=RateLimiter(rate=args.rate or None))
+        backends.append(BACKENDS[name](overrides.get(name), client))
+
+    started = time.time()
+    records, report = fetch_all(args.keywords, backends, args.max_pages)
+    for name, outcome in report.items():
+        if isinstance(outcome, str):
+            print(f"{name}: {outcome}")
+        else:
+            print(f"{name}: {outcome[0]} datasets in {outcome[1]:.1f}s")
+    print(f"Merged into {len(records)} unique datasets in {time.time() - started:.1f}s")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"datasets": records, "total_unique_datasets": len(records),
+                   "search_timestamp": time.strftime("%Y-%m-%d %H:%M:%S")}, f, indent=2)
+    print(f"Saved merged results to: {args.output}")
+
+    if any(isinstance(outcome, str) for outcome in report.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -24,7 +24,8 @@ search_all_pages() {
         
         url="${BASE_URL}?pageSize=${page_size}&pageNumber=${page}&resultType=full&species=Homo%20sapiens&keywords=${keywords}"
         
-        response=$(curl -s -X GET --header 'Accept: application/json' "$url")
+        # Retry throttling/5xx with backoff (curl honours Retry-After)
+        response=$(curl -s --retry 5 --retry-max-time 300 -X GET --header 'Accept: application/json' "$url")
         
         # Extract datasets from this page
         if command -v jq &> /dev/null; then
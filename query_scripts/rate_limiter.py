@@ -0,0 +1,143 @@
+"""
+Client-side token-bucket rate limiter shared by all PRIDE fetchers.
+
+Caps both the request rate (tokens refilled at `rate` per second, bucket of
+`burst`) and the number of requests in flight. One limiter instance can be
+shared by threads (`with limiter:`) and asyncio tasks (`async with limiter:`),
+and it keeps counters of how long callers spent waiting on it. A caller that
+keeps a request in flight past a single call (a streamed body) can hold a
+slot with `limiter.slot()` and take a token per attempt with `limiter.token()`.
+"""
+
+import asyncio
+import contextlib
+import threading
+import time
+
+# How often async waiters re-check for a free concurrency slot
+ASYNC_SLOT_POLL = 0.005
+
+
+class RateLimiter:
+    """Thread- and asyncio-safe token bucket with an optional concurrency cap."""
+
+    def __init__(self, rate=None, burst=1, max_concurrency=None):
+        """
+        Args:
+            rate: Requests per second (None disables rate limiting)
+            burst: Bucket size, i.e. how many requests may go out back to back
+            max_concurrency: Maximum requests in flight (None for no cap)
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_concurrency = max_concurrency
+
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._active = 0
+        self._lock = threading.Lock()
+        self._slot_free = threading.Condition(self._lock)
+
+        self.acquisitions = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _take_token(self):
+        """Take a token if one is available; otherwise return seconds until the next. Lock held."""
+        if self.rate is None:
+            return 0.0
+        self._refill(time.monotonic())
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def _record(self, waited):
+        self.acquisitions += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def acquire(self, slot=True):
+        """Block the calling thread until a slot (unless `slot` is False) and a token are available."""
+        started = time.monotonic()
+        if slot:
+            self.acquire_slot()
+        while True:
+            with self._lock:
+                delay = self._take_token()
+                if delay == 0:
+                    self._record(time.monotonic() - started)
+                    return
+            time.sleep(delay)
+
+    def acquire_slot(self):
+        """Block the calling thread until a concurrency slot is free, and take it."""
+        with self._lock:
+            while self.max_concurrency is not None and self._active >= self.max_concurrency:
+                self._slot_free.wait()
+            self._active += 1
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Hold a concurrency slot for the duration of the block (no token is taken)."""
+        self.acquire_slot()
+        try:
+            yield self
+        finally:
+            self.release()
+
+    @contextlib.contextmanager
+    def token(self):
+        """Take a token for one request made while a slot is already held."""
+        self.acquire(slot=False)
+        yield self
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a slot and a token are available."""
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                if self.max_concurrency is None or self._active < self.max_concurrency:
+                    self._active += 1
+                    break
+            await asyncio.sleep(ASYNC_SLOT_POLL)
+        try:
+            while True:
+                with self._lock:
+                    delay = self._take_token()
+                    if delay == 0:
+                        self._record(time.monotonic() - started)
+                        return
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # Cancelled while waiting for a token: give the slot back
+            self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            self._slot_free.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def summary(self):
+        average = self.total_wait / self.acquisitions if self.acquisitions else 0.0
+        return (f"Rate limiter: {self.acquisitions} requests, {self.total_wait:.2f}s total wait "
+                f"(avg {average * 1000:.0f} ms, max {self.max_wait * 1000:.0f} ms)")
@@ -0,0 +1,188 @@
+"""
+Persistent on-disk cache for PRIDE API responses.
+
+Entries are keyed by URL + sorted query parameters and stored as a body file
+plus a small JSON metadata file (ETag, Last-Modified, store time). Fresh
+entries (younger than the TTL) are served without touching the network;
+stale ones are revalidated with If-None-Match / If-Modified-Since. The total
+body size is bounded and the least recently used entries are evicted first.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlencode
+
+
+class ResponseCache:
+    """Size-bounded LRU response cache with TTL and conditional revalidation."""
+
+    def __init__(self, cache_dir=".pride_cache", ttl=24 * 3600, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def make_key(url, params=None):
+        """Stable cache key for a URL and its query parameters."""
+        query = urlencode(sorted((params or {}).items()), doseq=True)
+        return hashlib.sha256(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".meta.json", base + ".body"
+
+    def _entries(self):
+        """Yield (key, body_size, last_used) for every complete entry on disk."""
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".meta.json"):
+                continue
+            key = name[:-len(".meta.json")]
+            meta_path, body_path = self._paths(key)
+            try:
+                yield key, os.path.getsize(body_path), os.path.getmtime(meta_path)
+            except OSError:
+                continue
+
+    def lookup(self, url, params=None):
+        """
+        Look up a cached response.
+
+        Args:
+            url: Request URL
+            params: Query parameters
+
+        Returns:
+            Metadata dict with an added 'fresh' flag and 'body_path', or None
+        """
+        key = self.make_key(url, params)
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(body_path):
+            return None
+
+        meta["key"] = key
+        meta["body_path"] = body_path
+        meta["fresh"] = time.time() - meta.get("stored_at", 0) < self.ttl
+        # Access time drives LRU eviction
+        os.utime(meta_path)
+        return meta
+
+    def conditional_headers(self, meta):
+        """Revalidation headers for a stale entry."""
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def read_chunks(self, meta, chunk_size=64 * 1024):
+        """Yield a cached body in chunks."""
+        with open(meta["body_path"], "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def _new_meta(self, url, params, headers):
+        return {
+            "url": url,
+            "params": params,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "stored_at": time.time(),
+        }
+
+    def _write_meta(self, meta_path, meta):
+        """Replace an entry's metadata atomically, so readers never see a torn file."""
+        tmp_meta_path = f"{meta_path}.{threading.get_ident()}.tmp"
+        with open(tmp_meta_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta_path, meta_path)
+
+    def _commit(self, key, tmp_body_path, size, meta):
+        """Move a fully written body into place with its metadata, then enforce the size bound."""
+        meta_path, body_path = self._paths(key)
+        old_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+        os.replace(tmp_body_path, body_path)
+        # Metadata last, so a crash never leaves an entry pointing at a torn body
+        self._write_meta(meta_path, meta)
+
+        with self._lock:
+            self._total_bytes += size - old_size
+        self.evict()
+
+    def store(self, url, params, headers, body):
+        """Store a 200 response body with its validators."""
+        key = self.make_key(url, params)
+        tmp_body_path = f"{self._paths(key)[1]}.{threading.get_ident()}.tmp"
+        with open(tmp_body_path, "wb") as f:
+            f.write(body)
+        self._commit(key, tmp_body_path, len(body), self._new_meta(url, params, headers))
+
+    def store_stream(self, url, params, headers, chunks):
+        """
+        Pass a streamed 200 response body through while writing it to the cache.
+
+        The entry is only committed once the stream has been read to the end.
+        """
+        key = self.make_key(url, params)
+        meta = self._new_meta(url, params, headers)
+        tmp_body_path = f"{self._paths(key)[1]}.{threading.get_ident()}.tmp"
+        size = 0
+        try:
+            with open(tmp_body_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            self._commit(key, tmp_body_path, size, meta)
+        finally:
+            if os.path.exists(tmp_body_path):
+                os.remove(tmp_body_path)
+
+    def mark_revalidated(self, meta):
+        """Restart the TTL of an entry the server confirmed unchanged (304)."""
+        meta_path, _ = self._paths(meta["key"])
+        stored = {k: meta[k] for k in ("url", "params", "etag", "last_modified")}
+        stored["stored_at"] = time.time()
+        self._write_meta(meta_path, stored)
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            if self._total_bytes <= self.max_bytes:
+                return
+            for key, size, _ in sorted(self._entries(), key=lambda entry: entry[2]):
+                if self._total_bytes <= self.max_bytes:
+                    break
+                for path in self._paths(key):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                self._total_bytes -= size
+
+    def record(self, outcome):
+        """Count a 'hit', 'miss' or 'revalidated' lookup."""
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def summary(self):
+        return (f"Cache: {self.hits} hits, {self.revalidated} revalidated (304), "
+                f"{self.misses} misses")
@@ -0,0 +1,95 @@
+"""
+Incremental decoding of PRIDE result pages.
+
+Consumes a response body chunk by chunk, locates the project array (a bare
+top-level array, `{"list": [...]}` or the v2 `{"_embedded": {"compactprojects":
+[...]}}`), and yields one project at a time, projected down to the requested
+fields. Only the current project is ever fully decoded, so peak memory stays
+flat no matter how large the page is.
+"""
+
+import codecs
+import json
+import re
+
+# Keys under which PRIDE returns the project array
+ARRAY_KEYS = ("list", "compactprojects")
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+
+def _array_start(keys):
+    alternatives = "|".join(re.escape(key) for key in keys)
+    return re.compile(r'^\s*\[|"(?:%s)"\s*:\s*\[' % alternatives)
+
+
+def iter_array_items(chunks, array_keys=ARRAY_KEYS, fields=None):
+    """
+    Yield the elements of the project array from a stream of body chunks.
+
+    Args:
+        chunks: Iterable of bytes (e.g. response.iter_content())
+        array_keys: Object keys that may hold the project array
+        fields: If given, only these keys of each element are kept
+
+    Yields:
+        Decoded array elements (dicts projected to `fields`)
+    """
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    start_pattern = _array_start(array_keys)
+    chunks = iter(chunks)
+    buffer = ""
+    pos = None
+    eof = False
+
+    def read_more():
+        nonlocal buffer, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            buffer += text_decoder.decode(b"", final=True)
+        else:
+            buffer += text_decoder.decode(chunk)
+
+    # Locate the opening bracket of the project array
+    while pos is None:
+        match = start_pattern.search(buffer)
+        if match:
+            pos = match.end()
+        elif eof:
+            return
+        else:
+            read_more()
+
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos < len(buffer) and buffer[pos] == ",":
+            pos = _WHITESPACE.match(buffer, pos + 1).end()
+        if pos >= len(buffer):
+            if eof:
+                return
+            # Drop consumed text so the buffer only ever holds one element
+            buffer, pos = buffer[pos:], 0
+            read_more()
+            continue
+        if buffer[pos] == "]":
+            # Read the trailer too, so pass-through consumers (the response
+            # cache) see a complete body
+            for _ in chunks:
+                pass
+            return
+
+        try:
+            item, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            buffer, pos = buffer[pos:], 0
+            read_more()
+            continue
+
+        pos = end
+        if fields is not None and isinstance(item, dict):
+            item = {key: item[key] for key in fields if key in item}
+        yield item
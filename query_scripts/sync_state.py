@@ -0,0 +1,80 @@
+"""
+Local sync state for incremental PRIDE refreshes.
+
+Remembers the newest submission/publication dates and the accessions seen on
+previous runs, so a refresh only has to walk the date-sorted search results
+until it reaches projects it already knows about.
+"""
+
+import json
+import os
+import time
+
+DATE_FIELDS = ("submissionDate", "publicationDate")
+
+
+class SyncState:
+    """Last-seen dates and accession set, persisted as a small JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.last_seen = {field: None for field in DATE_FIELDS}
+        self.accessions = set()
+        self.updated_at = None
+
+    @classmethod
+    def load(cls, path):
+        state = cls(path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            state.last_seen.update(data.get("last_seen", {}))
+            state.accessions = set(data.get("accessions", []))
+            state.updated_at = data.get("updated_at")
+        return state
+
+    @property
+    def is_initial(self):
+        """True until a full crawl has been recorded."""
+        return not any(self.last_seen.values())
+
+    def observe(self, project):
+        """Record a fetched project (raw PRIDE dict or project record)."""
+        if project.get("accession"):
+            self.accessions.add(project["accession"])
+        for field in DATE_FIELDS:
+            value = project.get(field)
+            # ISO dates (YYYY-MM-DD...) order correctly as strings
+            if value and (self.last_seen[field] is None or value > self.last_seen[field]):
+                self.last_seen[field] = value
+
+    def save(self):
+        self.updated_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "last_seen": self.last_seen,
+                "accessions": sorted(self.accessions),
+                "updated_at": self.updated_at,
+            }, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def merge_projects(existing, changed, rejected):
+    """
+    Merge changed projects into a previous result list.
+
+    Args:
+        existing: Project records from the previous run's output
+        changed: Newly fetched records that match the filter (replace by accession)
+        rejected: Accessions fetched this run that no longer match the filter
+
+    Returns:
+        Merged list; previous order kept, new accessions appended
+    """
+    merged = {p.get("accession"): p for p in existing}
+    for accession in rejected:
+        merged.pop(accession, None)
+    for project in changed:
+        merged[project.get("accession")] = project
+    return list(merged.values())
@@ -1,78 +1,252 @@
+import asyncio
 import requests
 import json
 import csv
+import os
+import sys
+import argparse
+
+from crawl_checkpoint import CrawlCheckpoint
+from pride_client import configure_client, get_client
+from pride_query import PrideSearchQuery
+from rate_limiter import RateLimiter
+from stream_json import iter_array_items
+from response_cache import ResponseCache
+from sync_state import DATE_FIELDS, SyncState, merge_projects
+
+# The filter engine is shared with the dump and TSV filters
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "PRIDE_archive_query"))
+from filter_engine import BUILTIN_SPECS, load_filter  # noqa: E402
 
 BASE_URL = "https://www.ebi.ac.uk/pride/ws/archive/projects"
 QUERY = "immunopeptidomics cancer timsTOF cell line tissue xenograft"
+PAGE_SIZE = 100
 
-# Strict filtering parameters
-REQUIRED_INSTRUMENT = "timsTOF"
-REQUIRED_TERMS = ["immunopeptidomics", "cancer"]
-SAMPLE_TERMS = ["cell line", "tissue", "xenograft"]
+# Strict filtering criteria (see PRIDE_archive_query/filter_engine.py); --filter-spec replaces them
+DEFAULT_FILTER_SPEC = "strict-api"
+STRICT_FILTER = load_filter(DEFAULT_FILTER_SPEC)
 
 # Output files
 OUTPUT_JSON = "pride_filtered_immunopeptidomics_timsTOF.json"
 OUTPUT_TSV = "pride_filtered_immunopeptidomics_timsTOF.tsv"
+SYNC_STATE = "pride_sync_state.json"
+CHECKPOINT_DIR = ".pride_checkpoint"
+
+# Raw PRIDE fields needed by the filter, the outputs and the sync state;
+# everything else (e.g. projectDescription) is dropped while decoding unless
+# the --filter-spec names it
+RAW_FIELDS = ("accession", "title", "instruments", "diseases", "sampleProcessing",
+              "sampleProcessingProtocol", "ftpLinks", "submissionDate", "publicationDate")
 
 def matches_strict_criteria(project):
     """Apply strict filtering based on title, instrument, and sample metadata."""
-    title = (project.get("title") or "").lower()
-    instruments = [i.lower() for i in (project.get("instrument") or [])]
-    diseases = [d.lower() for d in (project.get("diseases") or [])]
-
-    raw_sample = project.get("sample")
-    if isinstance(raw_sample, list):
-        sample = " ".join(raw_sample).lower()
-    elif isinstance(raw_sample, str):
-        sample = raw_sample.lower()
-    else:
-        sample = ""
-
-    # Must mention immunopeptidomics & cancer
-    if not all(term in (title + " " + sample + " " + " ".join(diseases)) for term in REQUIRED_TERMS):
-        return False
-    # Must have timsTOF in instruments
-    if not any(REQUIRED_INSTRUMENT.lower() in i for i in instruments):
-        return False
-    # Must mention cell line, tissue, or xenograft in sample
-    if not any(term in sample for term in SAMPLE_TERMS):
-        return False
-    return True
-
-
-def get_pride_projects(query, max_pages=20):
-    """Query PRIDE API and apply strict filtering."""
-    filtered_projects = []
-    for page in range(max_pages):
-        params = {"q": query, "page": page, "size": 100}
-        r = requests.get(BASE_URL, params=params, timeout=60)
-        if r.status_code != 200:
-            print(f"Error: {r.status_code}")
-            break
+    return STRICT_FILTER.matches(project)
+
+
+def build_search_query(instrument_facet=None, strict_filter=None):
+    """Map the strict criteria onto PRIDE search parameters.
+
+    Keyword pushdowns (criteria marked "pushdown": "keyword") only narrow the
+    server-side result set, so their exact predicates stay client-side; an
+    exact instrument facet (e.g. "timsTOF Pro") replaces the client-side
+    instrument family check entirely. PRIDE's keyword search requires every
+    word, so only single-term or match-all criteria are pushed down.
+    """
+    strict_filter = strict_filter or STRICT_FILTER
+    query = PrideSearchQuery()
+    if instrument_facet:
+        query.facet("instrument", instrument_facet)
+    names = strict_filter.conjuncts()
+    if names is None:
+        # Anything but a plain AND of criteria is evaluated client-side as a whole
+        return query.client_side(strict_filter.name, strict_filter.matches)
+
+    for name in names:
+        criterion = strict_filter.criteria[name]
+        if instrument_facet and criterion.mode == "family":
+            continue
+        predicate = strict_filter.predicate(name)
+        if criterion.pushdown == "keyword" and (criterion.mode == "all" or len(criterion.terms) == 1):
+            query.keyword(*criterion.terms, verify=predicate, name=name)
+        else:
+            # OR groups cannot be expressed in PRIDE's filter syntax
+            query.client_side(name, predicate)
+    return query
+
+
+def to_project_record(p):
+    """Keep only the PRIDE fields used by the filter and the outputs."""
+    # v2 search results carry the protocol as one string; keep "sample" a list
+    sample = p.get("sampleProcessing") or p.get("sampleProcessingProtocol")
+    if isinstance(sample, str):
+        sample = [sample]
+    return {
+        "accession": p.get("accession"),
+        "title": p.get("title"),
+        "instrument": p.get("instruments"),
+        "diseases": p.get("diseases"),
+        "sample": sample,
+        "ftpLinks": p.get("ftpLinks"),
+        "submissionDate": p.get("submissionDate"),
+        "publicationDate": p.get("publicationDate")
+    }
+
+
+def page_request(query, page, base_url=None, size=PAGE_SIZE):
+    """URL and parameters for one page; `query` is a PrideSearchQuery or a legacy `q` string."""
+    if isinstance(query, PrideSearchQuery):
+        return base_url or query.url, query.params(page, size)
+    return base_url or BASE_URL, {"q": query, "page": page, "size": size}
+
+
+def fetch_page(query, page, base_url=None, size=PAGE_SIZE, checkpoint=None):
+    """Fetch one page of PRIDE projects through the shared retrying client.
+
+    Pages already completed in `checkpoint` are read from disk; fetched pages
+    are written to it. Raises requests.RequestException once retries are
+    exhausted, so a transient failure can no longer silently truncate the
+    result set.
+    """
+    if checkpoint is not None:
+        projects = checkpoint.load_page(page)
+        if projects is not None:
+            return projects
+
+    url, params = page_request(query, page, base_url, size)
+    # Decode the body as it streams in, one project at a time
+    projects = list(iter_array_items(get_client().iter_body(url, params), fields=RAW_FIELDS))
+    if checkpoint is not None:
+        checkpoint.save_page(page, projects)
+    return projects
+
+
+async def fetch_pages_async(query, max_pages=20, concurrency=4, base_url=None, checkpoint=None):
+    """Fetch pages with up to `concurrency` requests in flight.
+
+    Pages are scheduled in order; the first empty page marks the
+    end of the result set, pages after it are discarded, and the surviving
+    pages are returned in page order.
+    """
+    pages = {}
+    stop_page = max_pages
+    next_page = 0
+    in_flight = {}
+
+    while in_flight or next_page < stop_page:
+        while next_page < stop_page and len(in_flight) < concurrency:
+            task = asyncio.create_task(
+                asyncio.to_thread(fetch_page, query, next_page, base_url, checkpoint=checkpoint))
+            in_flight[task] = next_page
+            next_page += 1
+
+        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            page = in_flight.pop(task)
+            projects = task.result()
+            if not projects:
+                stop_page = min(stop_page, page)
+            elif page < stop_page:
+                pages[page] = projects
+
+        # Anything queued past the end of the result set is wasted work
+        for task, page in list(in_flight.items()):
+            if page >= stop_page:
+                task.cancel()
+                del in_flight[task]
 
-        data = r.json()
-        projects = data.get("list", []) if isinstance(data, dict) else data
+    return [pages[page] for page in sorted(pages) if page < stop_page]
+
+
+def iter_pages(query, max_pages=20, base_url=None, checkpoint=None):
+    """Fetch pages one after another until the first empty page."""
+    for page in range(max_pages):
+        projects = fetch_page(query, page, base_url, checkpoint=checkpoint)
         if not projects:
             break
+        yield projects
+
+
+def get_pride_projects(query, max_pages=20, concurrency=1, base_url=None, observe=None,
+                       checkpoint=None):
+    """Query PRIDE API and apply strict filtering.
+
+    `observe`, if given, is called with every raw project before filtering.
+    `checkpoint`, if given, persists each page as it arrives (see --resume);
+    a resumed crawl stops before the empty page it already reached.
+    """
+    if checkpoint is not None and checkpoint.end_page is not None:
+        max_pages = min(max_pages, checkpoint.end_page)
+    if concurrency > 1:
+        pages = asyncio.run(fetch_pages_async(query, max_pages, concurrency, base_url, checkpoint))
+    else:
+        pages = iter_pages(query, max_pages, base_url, checkpoint)
 
+    matches = query.matches if isinstance(query, PrideSearchQuery) else matches_strict_criteria
+    filtered_projects = []
+    for projects in pages:
         for p in projects:
-            proj = {
-                "accession": p.get("accession"),
-                "title": p.get("title"),
-                "instrument": p.get("instruments"),
-                "diseases": p.get("diseases"),
-                "sample": p.get("sampleProcessing"),
-                "ftpLinks": p.get("ftpLinks")
-            }
-            if matches_strict_criteria(proj):
-                filtered_projects.append(proj)
+            if observe is not None:
+                observe(p)
+            # Matched on the raw project, so specs can use any decoded field
+            if matches(p):
+                filtered_projects.append(to_project_record(p))
     return filtered_projects
 
+
+def iter_changed_projects(query, date_field, since, max_pages=20, base_url=None):
+    """Yield raw projects with `date_field` >= `since`, newest first.
+
+    Results are requested sorted by that date, so paging stops at the first
+    page that reaches projects older than the cut-off.
+    """
+    sorted_query = query.sorted_by(date_field, "DESC")
+    for projects in iter_pages(sorted_query, max_pages, base_url):
+        for p in projects:
+            if (p.get(date_field) or "") >= since:
+                yield p
+        if any((p.get(date_field) or "") < since for p in projects):
+            return
+
+
+def sync_projects(query, state, existing, max_pages=20, base_url=None):
+    """Fetch only projects submitted/published since the last run and merge them into `existing`."""
+    changed = {}
+    for date_field in DATE_FIELDS:
+        since = state.last_seen[date_field]
+        if since is None:
+            continue
+        for p in iter_changed_projects(query, date_field, since, max_pages, base_url):
+            changed[p.get("accession")] = p
+
+    new_count = sum(1 for accession in changed if accession not in state.accessions)
+    matching, rejected = [], []
+    for accession, p in changed.items():
+        state.observe(p)
+        if query.matches(p):
+            matching.append(to_project_record(p))
+        else:
+            rejected.append(accession)
+
+    print(f"Incremental sync: {len(changed)} changed projects ({new_count} new), "
+          f"{len(matching)} matching")
+    return merge_projects(existing, matching, rejected)
+
+
+def load_from_json(json_file):
+    with open(json_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
 def save_to_json(data, json_file):
     with open(json_file, "w") as f:
         json.dump(data, f, indent=2)
     print(f"Saved filtered results to: {json_file}")
 
+def as_list(value):
+    """List field of a saved record; records written by older runs may hold a plain string."""
+    if isinstance(value, str):
+        return [value]
+    return value or []
+
 def save_to_tsv(data, tsv_file):
     columns = ["accession", "title", "instrument", "diseases", "sample", "ftpLinks"]
     with open(tsv_file, "w", newline="", encoding="utf-8") as f:
@@ -84,16 +258,108 @@ def save_to_tsv(data, tsv_file):
                 proj.get("title", ""),
                 ", ".join(proj.get("instrument") or []),
                 ", ".join(proj.get("diseases") or []),
-                ", ".join(proj.get("sample") or []),
+                ", ".join(as_list(proj.get("sample"))),
                 ", ".join(proj.get("ftpLinks") or [])
             ])
     print(f"TSV file saved as: {tsv_file}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query PRIDE and keep strictly matching projects.")
+    parser.add_argument("--max-pages", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Number of page requests kept in flight (1 = sequential)")
+    parser.add_argument("--base-url",
+                        help="Override the PRIDE endpoint (e.g. a local pride_fixture_server.py)")
+    parser.add_argument("--no-pushdown", action="store_true",
+                        help="Use the legacy free-text /projects query and filter everything client-side")
+    parser.add_argument("--filter-spec", default=DEFAULT_FILTER_SPEC,
+                        help=f"Built-in filter spec ({', '.join(BUILTIN_SPECS)}) or JSON spec file "
+                             f"(see PRIDE_archive_query/filter_engine.py; default: {DEFAULT_FILTER_SPEC})")
+    parser.add_argument("--instrument-facet",
+                        help="Exact PRIDE instrument facet value (e.g. 'timsTOF Pro') to filter server-side")
+    parser.add_argument("--cache-dir", default=".pride_cache",
+                        help="Directory for cached PRIDE responses")
+    parser.add_argument("--cache-ttl", type=float, default=24,
+                        help="Hours before a cached page is revalidated with the server")
+    parser.add_argument("--cache-max-mb", type=int, default=512)
+    parser.add_argument("--no-cache", action="store_true", help="Always query the network")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Fetch only projects changed since the last run and merge them into the outputs")
+    parser.add_argument("--state-file", default=SYNC_STATE,
+                        help="Sync state used by --incremental")
+    parser.add_argument("--rate", type=float, default=10,
+                        help="Maximum PRIDE requests per second across all fetchers (0 = unlimited)")
+    parser.add_argument("--burst", type=int, default=1,
+                        help="Requests allowed back to back before --rate applies")
+    parser.add_argument("--max-in-flight", type=int,
+                        help="Maximum concurrent PRIDE requests across all fetchers")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR,
+                        help="Directory where each fetched page is persisted during a crawl")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted crawl from its last completed page")
+    args = parser.parse_args()
+
+    if args.incremental and args.no_pushdown:
+        parser.error("--incremental needs the sortable search API; drop --no-pushdown")
+    try:
+        STRICT_FILTER = load_filter(args.filter_spec)
+    except ValueError as e:
+        parser.error(str(e))
+    RAW_FIELDS = tuple(dict.fromkeys(RAW_FIELDS + STRICT_FILTER.record_keys()))
+
+    cache = None
+    if not args.no_cache:
+        # Date-sorted incremental pages change daily, so always revalidate them
+        ttl = 0 if args.incremental else args.cache_ttl * 3600
+        cache = ResponseCache(args.cache_dir, ttl=ttl,
+                              max_bytes=args.cache_max_mb * 1024 * 1024)
+    limiter = RateLimiter(rate=args.rate or None, burst=args.burst, max_concurrency=args.max_in_flight)
+    configure_client(cache=cache, limiter=limiter)
+
+    if args.no_pushdown:
+        query = QUERY
+    else:
+        query = build_search_query(args.instrument_facet)
+        print(query.describe())
+
+    state = SyncState.load(args.state_file) if args.incremental else None
+    incremental = state is not None and not state.is_initial and os.path.exists(OUTPUT_JSON)
+
     print("Querying PRIDE API and applying strict filters...")
-    results = get_pride_projects(QUERY, max_pages=20)
+    checkpoint = None
+    try:
+        if incremental:
+            print(f"Syncing changes since {state.last_seen} (last run {state.updated_at})")
+            results = sync_projects(query, state, load_from_json(OUTPUT_JSON),
+                                    max_pages=args.max_pages, base_url=args.base_url)
+        else:
+            url, params = page_request(query, 0, args.base_url)
+            checkpoint = CrawlCheckpoint(args.checkpoint_dir, CrawlCheckpoint.make_fingerprint(url, params))
+            recovered = checkpoint.start(resume=args.resume)
+            if recovered and checkpoint.end_page is not None:
+                print(f"Crawl already reached its last page ({checkpoint.end_page - 1}); "
+                      f"{recovered} pages recovered from {args.checkpoint_dir}")
+            elif recovered:
+                print(f"Resuming crawl at page {checkpoint.next_page} "
+                      f"({recovered} pages recovered from {args.checkpoint_dir})")
+            results = get_pride_projects(query, max_pages=args.max_pages,
+                                         concurrency=args.concurrency, base_url=args.base_url,
+                                         observe=state.observe if state is not None else None,
+                                         checkpoint=checkpoint)
+    except requests.RequestException as e:
+        print(f"Error: PRIDE query failed after retries: {e}")
+        sys.exit(1)
     print(f"Retrieved {len(results)} STRICTLY matching datasets.")
+    if cache is not None:
+        print(cache.summary())
+    print(limiter.summary())
 
     # Save outputs
     save_to_json(results, OUTPUT_JSON)
     save_to_tsv(results, OUTPUT_TSV)
+    if checkpoint is not None:
+        # Only now is the crawl safe on disk outside the checkpoint
+        checkpoint.clear()
+    if state is not None:
+        state.save()
+        print(f"Sync state saved to: {args.state_file}")